@@ -1,17 +1,22 @@
 import os
+import asyncio
 import base64
 import stat
 import time
-import json
 import datetime
-import subprocess
 import shutil
+import threading
 from pathlib import Path
 from typing import Dict, Optional, Tuple
-from timezone_utils import get_arg_tz
-from pydantic import BaseModel
+from timezone_utils import ARG_TZ
+import orjson
+from pydantic import BaseModel, ConfigDict
+from cachetools import TTLCache
 from zeep import Client, Settings
 from lxml import etree
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.serialization import load_pem_private_key, pkcs7
 import logging
 from dotenv import load_dotenv
 
@@ -39,9 +44,36 @@ WSCI_URLS = {
 # Cache y TTL
 CACHE_FILE = Path(os.getenv('AFIP_CACHE_FILE', '.cache/afip_tokens.json'))
 TOKEN_TTL = int(os.getenv('AFIP_TOKEN_TTL', 12 * 3600))  # segundos
-ARG_TZ = get_arg_tz()
+PERSONA_CACHE_TTL = int(os.getenv('AFIP_PERSONA_CACHE_TTL', 24 * 3600))  # segundos
+PERSONA_MISS_TTL = int(os.getenv('AFIP_PERSONA_MISS_TTL', 300))  # segundos
+
+# Clientes SOAP por URL: parsear el WSDL es caro, se hace una vez por proceso
+_wsaa_client_cache: Dict[str, Client] = {}
+_wsci_client_cache: Dict[str, Client] = {}
+_client_cache_lock = threading.Lock()
+_WSAA_PARSER = etree.XMLParser(resolve_entities=False, no_network=True)
+
+# Consultas por CUIT ya resueltas (y CUITs inexistentes, por menos tiempo).
+# Los datos de padron cambian muy rara vez: se guardan un dia por defecto.
+_persona_cache: TTLCache = TTLCache(maxsize=4096, ttl=PERSONA_CACHE_TTL)
+_persona_miss_cache: TTLCache = TTLCache(maxsize=1024, ttl=PERSONA_MISS_TTL)
+_persona_cache_lock = threading.Lock()
+
+
+def _get_client(cache: Dict[str, Client], wsdl: str, settings: Optional[Settings] = None) -> Client:
+    client = cache.get(wsdl)
+    if client is None:
+        with _client_cache_lock:
+            client = cache.get(wsdl)
+            if client is None:
+                client = Client(wsdl=wsdl, settings=settings)
+                cache[wsdl] = client
+    return client
 
 class AFIPPersonaData(BaseModel):
+    # Inmutable: las mismas instancias se comparten desde _persona_cache
+    model_config = ConfigDict(frozen=True)
+
     cuit: str
     nombre: Optional[str] = None
     razon_social: Optional[str] = None
@@ -55,41 +87,27 @@ class AFIPWebService:
         self.wsci_url = WSCI_URLS[self.environment]
         self._token_cache: Optional[str] = None
         self._sign_cache: Optional[str] = None
+        self._token_fetched_at: float = 0.0
+        self._credentials = None
+        self._wsaa_lock = threading.Lock()
+
+    def _load_cert_and_key(self):
+        """
+        Decodifica certificado y clave desde el entorno una sola vez por instancia.
+        Se mantienen solo en memoria: nada se escribe a disco para firmar.
+        """
+        if self._credentials is not None:
+            return self._credentials
 
-    def _write_cert_and_key(self) -> Tuple[str, str]:
         cert_b64 = os.getenv("AFIP_CERT_B64")
         key_b64 = os.getenv("AFIP_KEY_B64")
         if not cert_b64 or not key_b64:
             raise RuntimeError("Faltan AFIP_CERT_B64 o AFIP_KEY_B64 en el entorno")
 
-        cert = base64.b64decode(cert_b64)
-        key = base64.b64decode(key_b64)
-
-        cache_dir = Path(".cache")
-        cache_dir.mkdir(exist_ok=True)
-
-        p_crt = cache_dir / "afip.crt"
-        p_key = cache_dir / "afip.key"
-
-        # En Windows, si quedaron read-only de una corrida previa, falla al sobrescribir.
-        for p in (p_crt, p_key):
-            try:
-                if p.exists():
-                    os.chmod(p, stat.S_IWRITE | stat.S_IREAD)
-            except Exception:
-                pass
-
-        with open(p_crt, "wb") as f:
-            f.write(cert)
-        with open(p_key, "wb") as f:
-            f.write(key)
-
-        # En POSIX restringimos a solo lectura; en Windows dejamos rw para evitar bloqueos.
-        if os.name != "nt":
-            os.chmod(p_crt, stat.S_IRUSR)
-            os.chmod(p_key, stat.S_IRUSR)
-
-        return str(p_crt), str(p_key)
+        cert = x509.load_pem_x509_certificate(base64.b64decode(cert_b64))
+        key = load_pem_private_key(base64.b64decode(key_b64), password=None)
+        self._credentials = (cert, key)
+        return self._credentials
 
     def _clear_cache(self):
         """Borra el cache de tokens y limpia variables internas."""
@@ -103,7 +121,12 @@ class AFIPWebService:
             logging.warning(f"No pude borrar {CACHE_FILE}")
 
     def _clear_temp_credentials(self):
-        """Borra credenciales temporales (crt/key) para forzar su recreacion."""
+        """
+        Descarta el certificado/clave decodificados en memoria para forzar su
+        recarga, y borra los afip.crt/afip.key que versiones anteriores dejaban
+        en .cache (ya no se escriben a disco).
+        """
+        self._credentials = None
         temp_files = [Path(".cache") / "afip.crt", Path(".cache") / "afip.key"]
         for temp_file in temp_files:
             try:
@@ -121,6 +144,7 @@ class AFIPWebService:
         """Limpia todo el estado local AFIP borrando la carpeta .cache completa."""
         self._token_cache = None
         self._sign_cache = None
+        self._credentials = None
         cache_dir = Path(".cache")
         try:
             if cache_dir.exists():
@@ -138,8 +162,10 @@ class AFIPWebService:
         try:
             if not CACHE_FILE.exists():
                 return None
-            data = json.loads(CACHE_FILE.read_text())
-            if time.time() - data.get("fetched_at", 0) < TOKEN_TTL:
+            data = orjson.loads(CACHE_FILE.read_bytes())
+            fetched_at = data.get("fetched_at", 0)
+            if time.time() - fetched_at < TOKEN_TTL:
+                self._remember_token(data.get("token"), data.get("sign"), fetched_at)
                 return data.get("token"), data.get("sign")
             # venció: borramos el archivo y devolvemos None
             CACHE_FILE.unlink()
@@ -148,77 +174,83 @@ class AFIPWebService:
         return None
 
 
+    def _remember_token(self, token: str, sign: str, fetched_at: float):
+        self._token_cache = token
+        self._sign_cache = sign
+        self._token_fetched_at = fetched_at
+
     def _save_cache(self, token: str, sign: str):
         cache_dir = CACHE_FILE.parent
         cache_dir.mkdir(parents=True, exist_ok=True)
         os.chmod(cache_dir, stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR)
         
-        CACHE_FILE.write_text(json.dumps({
+        fetched_at = time.time()
+        self._remember_token(token, sign, fetched_at)
+        CACHE_FILE.write_bytes(orjson.dumps({
             "token": token,
             "sign": sign,
-            "fetched_at": time.time()
+            "fetched_at": fetched_at
         }))
         # Dar permiso sólo al usuario actual (rw-------)
         os.chmod(CACHE_FILE, stat.S_IRUSR | stat.S_IWUSR)
 
 
-    def _generate_ltr(self, service: str) -> str:
+    def _generate_ltr(self, service: str) -> bytes:
         # AFIP WSAA valida ventana temporal; enviar timestamps en hora AR
         # y sin microsegundos evita errores de formato/offset.
         now = datetime.datetime.now(ARG_TZ).replace(microsecond=0)
-        unique_id = now.strftime("%y%m%d%H%M")
-        gen = (now - datetime.timedelta(minutes=10)).isoformat(timespec="seconds")
-        exp = (now + datetime.timedelta(minutes=10)).isoformat(timespec="seconds")
-        return f"""<loginTicketRequest version="1.0">
-  <header>
-    <uniqueId>{unique_id}</uniqueId>
-    <generationTime>{gen}</generationTime>
-    <expirationTime>{exp}</expirationTime>
-  </header>
-  <service>{service}</service>
-</loginTicketRequest>"""
-
-
-    def _sign_cms(self, xml_str: str, cert_file: str, key_file: str) -> str:
-        proc = subprocess.run(
-            [
-                "openssl", "cms", "-sign",
-                "-signer", cert_file,
-                "-inkey", key_file,
-                "-nodetach",
-                "-outform", "DER"
-            ],
-            input=xml_str.encode("utf-8"),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=True
+        delta = datetime.timedelta(minutes=10)
+
+        root = etree.Element("loginTicketRequest", version="1.0")
+        header = etree.SubElement(root, "header")
+        etree.SubElement(header, "uniqueId").text = now.strftime("%y%m%d%H%M")
+        etree.SubElement(header, "generationTime").text = (now - delta).isoformat(timespec="seconds")
+        etree.SubElement(header, "expirationTime").text = (now + delta).isoformat(timespec="seconds")
+        etree.SubElement(root, "service").text = service
+        return etree.tostring(root, encoding="utf-8")
+
+    def _sign_cms(self, ltr: bytes) -> str:
+        # Equivalente a `openssl cms -sign -nodetach -outform DER`, en proceso.
+        cert, key = self._load_cert_and_key()
+        der = (
+            pkcs7.PKCS7SignatureBuilder()
+            .set_data(ltr)
+            .add_signer(cert, key, hashes.SHA256())
+            .sign(serialization.Encoding.DER, [pkcs7.PKCS7Options.Binary])
         )
-        return base64.b64encode(proc.stdout).decode("ascii")
+        return base64.b64encode(der).decode("ascii")
 
     def _call_wsaa(self, cms_b64: str) -> Tuple[str, str]:
-        # Cache
-        creds = self._load_cache()
-        if creds:
-            return creds
-        # Regenerar
-        try:
-            crt, key = self._write_cert_and_key()
-            ltr = self._generate_ltr(SERVICE)
-            cms_b64 = self._sign_cms(ltr, crt, key)
-            client = Client(self.wsaa_url)
-            resp = client.service.loginCms(cms_b64)
-            # Normalizar a bytes
-            xml_bytes = resp.encode('utf-8') if isinstance(resp, str) else etree.tostring(resp)
-            root = etree.fromstring(xml_bytes)
-            token = root.findtext('.//credentials/token')
-            sign = root.findtext('.//credentials/sign')
-            if not token or not sign:
-                raise RuntimeError("Error extrayendo token/sign de AFIP")
-            self._save_cache(token, sign)
-            return token, sign
-        except Exception:
-            self._clear_afip_state()
-            raise
+        # Un login WSAA a la vez: AFIP rechaza pedir un TA nuevo si ya hay uno vigente
+        with self._wsaa_lock:
+            # Cache en memoria primero; el archivo solo se lee si no hay token vigente en memoria
+            if (self._token_cache and self._sign_cache
+                    and time.time() - self._token_fetched_at < TOKEN_TTL):
+                return self._token_cache, self._sign_cache
+            creds = self._load_cache()
+            if creds:
+                return creds
+            # Regenerar
+            try:
+                ltr = self._generate_ltr(SERVICE)
+                cms_b64 = self._sign_cms(ltr)
+                client = _get_client(_wsaa_client_cache, self.wsaa_url)
+                resp = client.service.loginCms(cms_b64)
+                if isinstance(resp, str):
+                    # El XML trae declaracion de encoding: lxml solo lo acepta como bytes
+                    root = etree.fromstring(resp.encode('utf-8'), parser=_WSAA_PARSER)
+                else:
+                    # zeep ya lo devolvio parseado; no hace falta serializar y re-parsear
+                    root = resp
+                token = root.findtext('.//credentials/token')
+                sign = root.findtext('.//credentials/sign')
+                if not token or not sign:
+                    raise RuntimeError("Error extrayendo token/sign de AFIP")
+                self._save_cache(token, sign)
+                return token, sign
+            except Exception:
+                self._clear_afip_state()
+                raise
 
     async def get_persona_data(self, cuit: str) -> AFIPPersonaData:
         clean_cuit = cuit.replace("-", "").replace(" ", "").strip()
@@ -226,13 +258,28 @@ class AFIPWebService:
         if not clean_cuit.isdigit() or len(clean_cuit) != 11:
             raise ValueError("El CUIT debe tener 11 dígitos")
 
+        with _persona_cache_lock:
+            cached = _persona_cache.get(clean_cuit)
+            miss = _persona_miss_cache.get(clean_cuit)
+        if cached is not None:
+            return cached
+        if miss is not None:
+            raise Exception(miss)
+
+        # WSAA y zeep son bloqueantes: se consultan en un thread para no frenar el event loop
+        return await asyncio.to_thread(self._fetch_persona_data, clean_cuit, cuit)
+
+    def _fetch_persona_data(self, clean_cuit: str, cuit: str) -> AFIPPersonaData:
         last_error = None
         for attempt in range(2):
             try:
                 token, sign = self._call_wsaa(SERVICE)
 
-                settings = Settings(strict=False, xml_huge_tree=True)
-                client = Client(wsdl=self.wsci_url, settings=settings)
+                client = _get_client(
+                    _wsci_client_cache,
+                    self.wsci_url,
+                    Settings(strict=False, xml_huge_tree=True),
+                )
 
                 respuesta = client.service.getPersona_v2(
                     token,
@@ -249,17 +296,22 @@ class AFIPWebService:
 
                 domicilio_fiscal = self._format_address(getattr(datos_generales, 'domicilioFiscal', None))
 
-                return AFIPPersonaData(
+                persona = AFIPPersonaData(
                     cuit=clean_cuit,
                     nombre=nombre_completo,
                     domicilio_fiscal=domicilio_fiscal
                 )
+                with _persona_cache_lock:
+                    _persona_cache[clean_cuit] = persona
+                return persona
 
             except Exception as e:
                 last_error = e
                 msg = str(e).lower()
 
-                if "no se encontró información" in msg:
+                if "no se encontró información" in msg or "no se encontraron datos generales" in msg:
+                    with _persona_cache_lock:
+                        _persona_miss_cache[clean_cuit] = str(e)
                     raise e
 
                 is_auth_error = "token" in msg or "sign" in msg or "autenticación" in msg or "expired" in msg
@@ -286,11 +338,17 @@ class AFIPWebService:
     def _format_address(self, dom) -> Optional[str]:
         if not dom:
             return None
-        parts = []
-        if getattr(dom, 'codPostal', None): parts.append(f"( {dom.codPostal} )")
-        if getattr(dom, 'descripcionProvincia', None): parts.append(dom.descripcionProvincia.upper())
-        if getattr(dom, 'direccion', None): parts.append(dom.direccion.upper())
-        return " - ".join(parts) if parts else None
+        # Los objetos de zeep guardan los valores en __values__, no en __dict__;
+        # se lee cada atributo una sola vez.
+        cod_postal = getattr(dom, 'codPostal', None)
+        provincia = getattr(dom, 'descripcionProvincia', None)
+        direccion = getattr(dom, 'direccion', None)
+        joined = " - ".join(part for part in (
+            f"( {cod_postal} )" if cod_postal else None,
+            provincia.upper() if provincia else None,
+            direccion.upper() if direccion else None,
+        ) if part)
+        return joined or None
 
 # Instancia global
 afip_ws = AFIPWebService()
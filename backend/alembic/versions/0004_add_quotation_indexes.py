@@ -0,0 +1,57 @@
+"""Add indexes for quotation list and search queries
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-15 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def _existing_indexes() -> set:
+    inspector = sa.inspect(op.get_bind())
+    return {idx["name"] for idx in inspector.get_indexes("quotations")}
+
+
+def upgrade() -> None:
+    existing = _existing_indexes()
+    is_postgres = op.get_bind().dialect.name == "postgresql"
+
+    # En Postgres se crean con CONCURRENTLY para no bloquear escrituras,
+    # lo que requiere ejecutarlas fuera de la transaccion de la migracion.
+    with op.get_context().autocommit_block():
+        if "ix_quotations_machine_code" not in existing:
+            op.create_index(
+                "ix_quotations_machine_code", "quotations", ["machine_code"],
+                postgresql_concurrently=is_postgres,
+            )
+        if "ix_quotations_client_cuit" not in existing:
+            op.create_index(
+                "ix_quotations_client_cuit", "quotations", ["client_cuit"],
+                postgresql_concurrently=is_postgres,
+            )
+        if "ix_quotations_active_created" not in existing:
+            op.create_index(
+                "ix_quotations_active_created", "quotations", ["is_deleted", "created_at"],
+                postgresql_where=sa.text("is_deleted = false"),
+                postgresql_concurrently=is_postgres,
+            )
+
+
+def downgrade() -> None:
+    existing = _existing_indexes()
+
+    for name in (
+        "ix_quotations_active_created",
+        "ix_quotations_client_cuit",
+        "ix_quotations_machine_code",
+    ):
+        if name in existing:
+            op.drop_index(name, table_name="quotations")
@@ -0,0 +1,82 @@
+"""Server-side defaults for quotation and exchange-rate timestamps
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-15 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+# Hasta ahora los timestamps se guardaban en hora de Argentina sin offset;
+# la base pasa a generarlos en UTC (now() / CURRENT_TIMESTAMP).
+ARG_TZ_NAME = "America/Argentina/Buenos_Aires"
+TIMESTAMP_COLUMNS = (
+    ("quotations", "created_at"),
+    ("exchange_rates", "fetched_at"),
+)
+
+
+def _existing_tables() -> set:
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade() -> None:
+    tables = _existing_tables()
+    is_postgres = op.get_bind().dialect.name == "postgresql"
+
+    for table, column in TIMESTAMP_COLUMNS:
+        if table not in tables:
+            continue
+        if is_postgres:
+            op.execute(
+                f"ALTER TABLE {table} ALTER COLUMN {column} TYPE TIMESTAMP WITH TIME ZONE "
+                f"USING {column} AT TIME ZONE '{ARG_TZ_NAME}'"
+            )
+            op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET DEFAULT now()")
+        else:
+            # SQLite: pasar los valores existentes a UTC y recrear la columna con default
+            op.execute(
+                f"UPDATE {table} SET {column} = datetime({column}, '+3 hours') "
+                f"WHERE {column} IS NOT NULL"
+            )
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.alter_column(
+                    column,
+                    existing_type=sa.DateTime(),
+                    type_=sa.DateTime(timezone=True),
+                    server_default=sa.func.current_timestamp(),
+                )
+
+
+def downgrade() -> None:
+    tables = _existing_tables()
+    is_postgres = op.get_bind().dialect.name == "postgresql"
+
+    for table, column in TIMESTAMP_COLUMNS:
+        if table not in tables:
+            continue
+        if is_postgres:
+            op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} DROP DEFAULT")
+            op.execute(
+                f"ALTER TABLE {table} ALTER COLUMN {column} TYPE TIMESTAMP WITHOUT TIME ZONE "
+                f"USING {column} AT TIME ZONE '{ARG_TZ_NAME}'"
+            )
+        else:
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.alter_column(
+                    column,
+                    existing_type=sa.DateTime(timezone=True),
+                    type_=sa.DateTime(),
+                    server_default=None,
+                )
+            op.execute(
+                f"UPDATE {table} SET {column} = datetime({column}, '-3 hours') "
+                f"WHERE {column} IS NOT NULL"
+            )
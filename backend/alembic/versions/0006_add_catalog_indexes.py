@@ -0,0 +1,50 @@
+"""Add indexes for machine/option filters and quotation ordering
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-15 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+# (tabla, nombre del indice, columnas)
+INDEXES = (
+    ("machines", "ix_machines_active", ["active"]),
+    ("machines", "ix_machines_active_category", ["active", "category"]),
+    ("options", "ix_options_active", ["active"]),
+    ("quotations", "ix_quotations_created_at", ["created_at"]),
+    ("quotations", "ix_quotations_total_discount_percent", ["total_discount_percent"]),
+)
+
+
+def _existing_indexes() -> set:
+    inspector = sa.inspect(op.get_bind())
+    tables = {table for table, _, _ in INDEXES}
+    return {idx["name"] for table in tables for idx in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    existing = _existing_indexes()
+    is_postgres = op.get_bind().dialect.name == "postgresql"
+
+    # Igual que 0004: CONCURRENTLY en Postgres, fuera de la transaccion
+    with op.get_context().autocommit_block():
+        for table, name, columns in INDEXES:
+            if name not in existing:
+                op.create_index(name, table, columns, postgresql_concurrently=is_postgres)
+
+
+def downgrade() -> None:
+    existing = _existing_indexes()
+
+    for table, name, _ in reversed(INDEXES):
+        if name in existing:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,56 @@
+"""Add precomputed client_cuit_digits column to quotations
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-15 00:00:00.000000
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+# Igual que db.cuit_digits: se quita cualquier separador, no solo guiones
+_NON_DIGITS_RE = re.compile(r"\D")
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columns = {col["name"] for col in inspector.get_columns("quotations")}
+    indexes = {idx["name"] for idx in inspector.get_indexes("quotations")}
+
+    if "client_cuit_digits" not in columns:
+        op.add_column("quotations", sa.Column("client_cuit_digits", sa.String(), nullable=True))
+
+    # Las filas existentes se completan una vez; las nuevas las llena el modelo al insertar
+    rows = conn.execute(sa.text(
+        "SELECT id, client_cuit FROM quotations "
+        "WHERE client_cuit IS NOT NULL AND client_cuit_digits IS NULL"
+    )).all()
+    if rows:
+        conn.execute(
+            sa.text("UPDATE quotations SET client_cuit_digits = :digits WHERE id = :id"),
+            [{"id": row.id, "digits": _NON_DIGITS_RE.sub("", row.client_cuit)} for row in rows],
+        )
+
+    if "ix_quotations_client_cuit_digits" not in indexes:
+        op.create_index("ix_quotations_client_cuit_digits", "quotations", ["client_cuit_digits"])
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columns = {col["name"] for col in inspector.get_columns("quotations")}
+    indexes = {idx["name"] for idx in inspector.get_indexes("quotations")}
+
+    if "ix_quotations_client_cuit_digits" in indexes:
+        op.drop_index("ix_quotations_client_cuit_digits", table_name="quotations")
+    if "client_cuit_digits" in columns:
+        op.drop_column("quotations", "client_cuit_digits")
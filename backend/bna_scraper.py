@@ -1,10 +1,13 @@
 """
 Scraper del tipo de cambio USD/ARS desde Banco Nacion Argentina (BNA).
 
-Incluye 3 estrategias:
-1) Pipeline curl compatible con Linux (equivalente al compartido por usuario).
-2) Descarga HTML con curl y parseo robusto de la fila "Dolar U.S.A".
-3) Fallback urllib + parseo robusto.
+Incluye 2 estrategias:
+1) Descarga HTML con un cliente httpx compartido (conexiones reutilizadas)
+   y parseo robusto de la fila "Dolar U.S.A".
+2) Fallback urllib + parseo robusto.
+
+Ambas consultan todas las URLs en paralelo y se quedan con la primera que
+devuelve un valor.
 """
 
 from __future__ import annotations
@@ -13,9 +16,17 @@ import html
 import logging
 import os
 import re
-import subprocess
+import threading
+import time
 import unicodedata
-from typing import Optional
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Callable, Optional
+
+import httpx
+from lxml import etree
+from lxml import html as lhtml
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +37,42 @@ BNA_URLS = [
     "https://www.nativanacion.com.ar/Personas",
 ]
 
+_FETCH_TIMEOUT = 15  # segundos por URL
+_STREAM_CHUNK_SIZE = 8192
+_FETCH_POOL = ThreadPoolExecutor(max_workers=len(BNA_URLS), thread_name_prefix="bna")
+_HTTP = httpx.Client(
+    timeout=_FETCH_TIMEOUT,
+    follow_redirects=True,
+    headers={"User-Agent": "Mozilla/5.0"},
+)
+
+# Ultimo tipo de cambio obtenido: (timestamp, resultado). BNA publica una vez
+# por dia habil, asi que unos minutos de cache alcanzan.
+_RATE_TTL = int(os.getenv("BNA_RATE_TTL", "900"))  # segundos
+_RATE_CACHE: Optional[tuple[float, dict]] = None
+_RATE_LOCK = threading.Lock()
+
+class _NumericCharsTable(dict):
+    """
+    Tabla para str.translate que conserva solo digitos, ',', '.' y '-'.
+    Cualquier otro caracter se borra y queda memorizado en la tabla.
+    """
+
+    def __missing__(self, key: int) -> None:
+        self[key] = None
+        return None
+
+
+_NUM_KEEP = _NumericCharsTable((ord(c), ord(c)) for c in "0123456789,.-")
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_WS_RE = re.compile(r"\s+")
+_NUM_RE = re.compile(r"\d[\d\.\,]*")
+_DOLAR_LINE_RE = re.compile(
+    r"dolar\s*u\.?s\.?a\.?\s+(\d[\d\.\,]*)\s+(\d[\d\.\,]*)",
+    re.IGNORECASE,
+)
+
 
 def _normalize_text(value: str) -> str:
     normalized = unicodedata.normalize("NFD", value)
@@ -34,9 +81,9 @@ def _normalize_text(value: str) -> str:
 
 
 def _clean_cell_text(cell_html: str) -> str:
-    text = re.sub(r"<[^>]+>", " ", cell_html)
+    text = _TAG_RE.sub(" ", cell_html)
     text = html.unescape(text)
-    text = re.sub(r"\s+", " ", text).strip()
+    text = _WS_RE.sub(" ", text).strip()
     return text
 
 
@@ -49,7 +96,7 @@ def _parse_arg_number(raw: str) -> Optional[float]:
     if not raw:
         return None
     candidate = raw.strip()
-    candidate = re.sub(r"[^\d,.\-]", "", candidate)
+    candidate = candidate.translate(_NUM_KEEP)
     if not candidate:
         return None
 
@@ -65,62 +112,62 @@ def _parse_arg_number(raw: str) -> Optional[float]:
         return None
 
 
+def _rate_from_row(row) -> Optional[float]:
+    """Si `row` (elemento <tr>) es la fila de 'Dolar U.S.A', devuelve el valor vendedor."""
+    row_text = _WS_RE.sub(" ", "".join(row.itertext())).strip()
+    normalized = _normalize_text(row_text)
+
+    if "dolar u.s.a" not in normalized and "dolar usa" not in normalized:
+        return None
+
+    cells = row.xpath("./td|./th")
+    if not cells:
+        # fallback: extraer numeros de texto de fila
+        numbers = _NUM_RE.findall(row_text)
+        parsed = [_parse_arg_number(n) for n in numbers]
+        parsed = [n for n in parsed if n and n > 0]
+        return parsed[-1] if parsed else None
+
+    cell_values = ["".join(c.itertext()) for c in cells]
+    numeric_cells = []
+    for cell in cell_values:
+        value = _parse_arg_number(cell)
+        if value and value > 0:
+            numeric_cells.append(value)
+
+    # Estructura usual: [nombre, compra, venta] -> queremos venta
+    if len(numeric_cells) >= 2:
+        return numeric_cells[-1]
+    if len(numeric_cells) == 1:
+        return numeric_cells[0]
+    return None
+
+
 def _extract_rate_from_dolar_row(html_content: str) -> Optional[float]:
     """Busca la fila de 'Dolar U.S.A' y toma el valor vendedor."""
     if not html_content:
         return None
 
-    rows = re.findall(r"<tr[^>]*>(.*?)</tr>", html_content, flags=re.IGNORECASE | re.DOTALL)
-    for row in rows:
-        row_text = _clean_cell_text(row)
-        normalized = _normalize_text(row_text)
-
-        if "dolar u.s.a" not in normalized and "dolar usa" not in normalized:
-            continue
-
-        cells = re.findall(r"<t[dh][^>]*>(.*?)</t[dh]>", row, flags=re.IGNORECASE | re.DOTALL)
-        if not cells:
-            # fallback: extraer numeros de texto de fila
-            numbers = re.findall(r"\d[\d\.\,]*", row_text)
-            parsed = [_parse_arg_number(n) for n in numbers]
-            parsed = [n for n in parsed if n and n > 0]
-            if parsed:
-                return parsed[-1]
-            continue
-
-        cell_values = [_clean_cell_text(c) for c in cells]
-        numeric_cells = []
-        for cell in cell_values:
-            value = _parse_arg_number(cell)
-            if value and value > 0:
-                numeric_cells.append(value)
-
-        # Estructura usual: [nombre, compra, venta] -> queremos venta
-        if len(numeric_cells) >= 2:
-            return numeric_cells[-1]
-        if len(numeric_cells) == 1:
-            return numeric_cells[0]
+    try:
+        doc = lhtml.fromstring(html_content)
+    except (etree.ParserError, ValueError):
+        return None
+
+    for row in doc.iter("tr"):
+        rate = _rate_from_row(row)
+        if rate:
+            return rate
 
     return None
 
 
-def _parse_html(html_content: str) -> Optional[float]:
-    # Intento principal: parsear fila exacta de la tabla
-    rate = _extract_rate_from_dolar_row(html_content)
-    if rate:
-        return rate
-
-    # Fallback de texto completo (incluye casos con estructura HTML distinta)
-    text = _clean_cell_text(html.unescape(html_content))
-    text = re.sub(r"\s+", " ", text)
+def _rate_from_text(text: str) -> Optional[float]:
+    """Fallback sobre el texto plano de la pagina (estructura HTML distinta)."""
+    text = _WS_RE.sub(" ", text)
     norm_text = _normalize_text(text)
 
     # Buscar patron de fila textual: Dolar U.S.A <compra> <venta>
-    line_match = re.search(
-        r"dolar\s*u\.?s\.?a\.?\s+(\d[\d\.\,]*)\s+(\d[\d\.\,]*)",
-        norm_text,
-        flags=re.IGNORECASE,
-    )
+    line_match = _DOLAR_LINE_RE.search(norm_text)
     if line_match:
         venta = _parse_arg_number(line_match.group(2))
         if venta and venta > 0:
@@ -135,7 +182,7 @@ def _parse_html(html_content: str) -> Optional[float]:
         return None
 
     fragment = norm_text[idx : idx + 900]
-    numbers = re.findall(r"\d[\d\.\,]*", fragment)
+    numbers = _NUM_RE.findall(fragment)
     parsed = [_parse_arg_number(n) for n in numbers]
     parsed = [n for n in parsed if n and n > 0]
     if len(parsed) >= 2:
@@ -145,81 +192,101 @@ def _parse_html(html_content: str) -> Optional[float]:
     return None
 
 
-def _scrape_via_linux_pipeline() -> Optional[float]:
-    """
-    Replica del pipeline compartido por usuario (Linux):
-      curl -s ... | grep -A 2 'Dolar U.S.A' | head -3 | tail -1 | ...
-    """
-    if os.name == "nt":
-        return None
+def _parse_html(html_content: str) -> Optional[float]:
+    # Intento principal: parsear fila exacta de la tabla
+    rate = _extract_rate_from_dolar_row(html_content)
+    if rate:
+        return rate
 
-    try:
-        cmd = (
-            "curl -s https://www.bna.com.ar/Personas | "
-            "grep -A 2 'Dolar U.S.A' | head -3 | tail -1 | "
-            "sed 's/<//g' | sed 's/>//g' | sed 's/td//g' | sed 's/,/./g' | sed 's/ //g' | "
-            "rev | cut -b 3- | rev"
-        )
-        result = subprocess.run(
-            ["bash", "-lc", cmd],
-            capture_output=True,
-            text=True,
-            timeout=20,
-        )
-        output = (result.stdout or "").strip()
-        return _parse_arg_number(output)
-    except Exception as exc:
-        logger.warning("Pipeline Linux BNA fallo: %s", exc)
-        return None
+    return _rate_from_text(_clean_cell_text(html.unescape(html_content)))
 
 
-def _scrape_via_curl_html() -> Optional[float]:
-    for url in BNA_URLS:
+def _first_rate(scrape: Callable[[str], Optional[float]], label: str) -> Optional[float]:
+    """
+    Consulta todas las URLs de BNA en paralelo y devuelve el primer tipo de
+    cambio valido; las consultas que aun no arrancaron se cancelan.
+    """
+    def safe_scrape(url: str) -> Optional[float]:
         try:
-            result = subprocess.run(
-                ["curl", "-sL", "--max-time", "15", url],
-                capture_output=True,
-                text=True,
-                timeout=20,
-            )
-            html_content = result.stdout or ""
-            rate = _parse_html(html_content)
+            return scrape(url)
+        except Exception as exc:
+            logger.warning("%s fallo para %s: %s", label, url, exc)
+            return None
+
+    futures = [_FETCH_POOL.submit(safe_scrape, url) for url in BNA_URLS]
+    try:
+        for future in as_completed(futures, timeout=_FETCH_TIMEOUT + 5):
+            rate = future.result()
             if rate:
                 return rate
-        except (subprocess.TimeoutExpired, FileNotFoundError) as exc:
-            logger.warning("curl no disponible o timeout para %s: %s", url, exc)
-            return None
-        except Exception as exc:
-            logger.warning("curl html fallo para %s: %s", url, exc)
+    except FuturesTimeoutError:
+        logger.warning("%s: timeout esperando respuesta de BNA", label)
+    finally:
+        for future in futures:
+            future.cancel()
     return None
 
 
-def _scrape_via_urllib() -> Optional[float]:
-    try:
-        import urllib.request
-        for url in BNA_URLS:
-            try:
-                req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
-                with urllib.request.urlopen(req, timeout=15) as resp:
-                    html_content = resp.read().decode("utf-8", errors="ignore")
-                rate = _parse_html(html_content)
+def _scrape_url_via_httpx(url: str) -> Optional[float]:
+    """
+    Parsea la pagina a medida que llega y corta la descarga apenas se cierra
+    la fila de 'Dolar U.S.A', sin materializar el resto del HTML.
+    """
+    parser = etree.HTMLPullParser(events=("end",), tag="tr")
+    with _HTTP.stream("GET", url) as resp:
+        resp.raise_for_status()
+        for chunk in resp.iter_text(chunk_size=_STREAM_CHUNK_SIZE):
+            parser.feed(chunk)
+            for _, row in parser.read_events():
+                rate = _rate_from_row(row)
                 if rate:
                     return rate
-            except Exception as exc:
-                logger.warning("urllib intento fallo para %s: %s", url, exc)
-                continue
-    except Exception as exc:
-        logger.warning("urllib fallback fallo: %s", exc)
-    return None
+
+    root = parser.close()
+    if root is None:
+        return None
+    return _rate_from_text("".join(root.itertext()))
+
+
+def _scrape_url_via_urllib(url: str) -> Optional[float]:
+    req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
+    with urllib.request.urlopen(req, timeout=_FETCH_TIMEOUT) as resp:
+        return _parse_html(resp.read().decode("utf-8", errors="ignore"))
+
+
+def _scrape_via_httpx() -> Optional[float]:
+    return _first_rate(_scrape_url_via_httpx, "httpx html")
+
+
+def _scrape_via_urllib() -> Optional[float]:
+    return _first_rate(_scrape_url_via_urllib, "urllib")
 
 
 def get_usd_ars_rate() -> dict:
     """
     Obtiene tipo de cambio vendedor USD/ARS desde BNA.
+    Los valores obtenidos se reutilizan durante BNA_RATE_TTL segundos.
     """
+    global _RATE_CACHE
+
+    cached = _RATE_CACHE
+    if cached and time.time() - cached[0] < _RATE_TTL:
+        return cached[1]
+
+    # Una sola consulta a BNA a la vez; el resto espera y usa su resultado.
+    with _RATE_LOCK:
+        cached = _RATE_CACHE
+        if cached and time.time() - cached[0] < _RATE_TTL:
+            return cached[1]
+        result = _scrape_rate()
+        if result["rate"] is not None:
+            _RATE_CACHE = (time.time(), result)
+        return result
+
+
+def _scrape_rate() -> dict:
     strategies = (
-        ("linux-pipeline", _scrape_via_linux_pipeline),
-        ("curl-html", _scrape_via_curl_html),
+        ("httpx-html", _scrape_via_httpx),
         ("urllib-html", _scrape_via_urllib),
     )
 
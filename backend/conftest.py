@@ -0,0 +1,61 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from main import app, get_db, Base, _invalidate_cache, _response_caches
+
+# Base de test compartida por todos los modulos: en memoria, una sola conexion
+# compartida con los hilos del TestClient. Con `pytest -n auto` (pytest-xdist)
+# cada worker es un proceso aparte con su propia base, sin archivos que compartir
+SQLALCHEMY_DATABASE_URL = "sqlite://"
+_engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=StaticPool
+)
+
+# Sin expirar al commit: los fixtures leen atributos despues de commitear y
+# cada acceso volvia a hacer SELECT. Los tests que necesitan datos frescos abren otra sesion
+_TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=_engine)
+
+Base.metadata.create_all(bind=_engine)
+
+
+@pytest.fixture(scope="session")
+def engine():
+    return _engine
+
+
+@pytest.fixture(scope="session")
+def session_factory():
+    return _TestingSessionLocal
+
+
+@pytest.fixture(scope="session")
+def client(session_factory):
+    """TestClient con get_db apuntando a la base de test. Sin `with`: el startup de la
+    app usa el engine de produccion y crearia agromaq_enhanced.db"""
+    def override_get_db():
+        try:
+            # La app mantiene la semantica de produccion (expira al commit)
+            db = session_factory(expire_on_commit=True)
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+
+
+@pytest.fixture(scope="session")
+def clear_tables():
+    def clear(db, *tables):
+        """Vacia las tablas en un solo executescript, sin pasar por el ORM.
+        executescript hace COMMIT antes de correr: no usar dentro de una transaccion de test"""
+        script = "".join(f"DELETE FROM {table};" for table in tables)
+        db.connection().connection.driver_connection.executescript(script)
+        # El script no pasa por los hooks de Session que invalidan los caches de respuestas
+        for group in _response_caches:
+            _invalidate_cache(group)
+
+    return clear
@@ -1,16 +1,80 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, Table
+import re
+from datetime import datetime, timezone
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, Table, Index, text
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
-from datetime import datetime
-from timezone_utils import get_arg_tz
+from sqlalchemy.sql import func
 
 # Database setup
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./agromaq_enhanced.db")
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
+
+# Dimensionado del QueuePool; SQLite en memoria usa SingletonThreadPool y no los acepta
+POOL_KWARGS = {} if IS_SQLITE else {
+    "pool_size": 20,
+    "max_overflow": 10,
+    "pool_timeout": 30,
+    # Recicla conexiones antes de que el servidor las corte por inactividad
+    "pool_recycle": 3600,
+}
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    pool_pre_ping=True,
+    **POOL_KWARGS,
+    # Lotes de INSERT multi-VALUES acotados (límite de variables de SQLite)
+    insertmanyvalues_page_size=500,
+    # Cache de SQL compilado (default 500): hay margen para todas las variantes de consultas
+    query_cache_size=1200,
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},
+)
+
+
+if IS_SQLITE:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL permite lecturas concurrentes mientras hay una escritura en curso
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        # Cache de paginas de 64 MB (valor negativo = KiB) en vez de los ~2 MB por defecto
+        cursor.execute("PRAGMA cache_size=-64000")
+        cursor.close()
+        # pysqlite no emite BEGIN antes de un SAVEPOINT: el RELEASE del begin_nested
+        # commiteaba solo. La transaccion la abre SQLAlchemy (receta de pysqlite)
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _sqlite_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+class UTCDateTime(TypeDecorator):
+    """DateTime generado por la base en UTC. SQLite lo devuelve sin offset: se lo agrega
+    al leer para que `.isoformat()` no se interprete como hora local en el frontend"""
+    impl = DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is not None and value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
-ARG_TZ = get_arg_tz()
 
 # Tabla intermedia para relación muchos-a-muchos entre máquinas y opcionales
 machine_option = Table(
@@ -30,22 +94,28 @@ class Option(Base):
     name = Column(String, unique=True, index=True)
     price = Column(Float)
     description = Column(Text)
-    active = Column(Boolean, default=True)
+    active = Column(Boolean, default=True, index=True)
+    machines = relationship("Machine", secondary=machine_option, back_populates="options")
 
 class Machine(Base):
     __tablename__ = "machines"
+    __table_args__ = (
+        # Filtros del listado admin (active + category)
+        Index("ix_machines_active_category", "active", "category"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     code = Column(String, unique=True, index=True)
     name = Column(String)
     price = Column(Float)
     category = Column(String)
     description = Column(Text)
-    active = Column(Boolean, default=True)
+    active = Column(Boolean, default=True, index=True)
     model_name = Column(String, nullable=True)        # ej: "A.V.A. 4000"
     product_title = Column(String, nullable=True)      # ej: "ACOPLADO VOLCADOR TRIVUELCO DE USO RURAL"
     price_currency = Column(String, default="USD")     # "USD" o "ARS"
-    options = relationship("Option", secondary=machine_option, backref="machines")
-    specs = relationship("MachineSpec", back_populates="machine", order_by="MachineSpec.sort_order")
+    # selectin: al listar maquinas se carga cada coleccion con un solo IN (...) en vez de N+1
+    options = relationship("Option", secondary=machine_option, back_populates="machines", lazy="selectin")
+    specs = relationship("MachineSpec", back_populates="machine", order_by="MachineSpec.sort_order", lazy="selectin")
 
 
 class MachineSpec(Base):
@@ -75,13 +145,26 @@ class ExchangeRate(Base):
     currency_to = Column(String, default="ARS")
     rate = Column(Float, nullable=False)
     source = Column(String, nullable=True)             # "manual" o "BNA"
-    fetched_at = Column(DateTime, default=lambda: datetime.now(ARG_TZ))
+    # default en Python ademas del de la base: las tablas creadas con create_all antes
+    # de la migracion 0005 no tienen DEFAULT en la columna
+    fetched_at = Column(UTCDateTime(timezone=True), default=_utcnow, server_default=func.now())
 
 class Quotation(Base):
     __tablename__ = "quotations"
+    __table_args__ = (
+        # Listado de cotizaciones activas mas recientes; en Postgres es parcial
+        Index(
+            "ix_quotations_active_created",
+            "is_deleted",
+            "created_at",
+            postgresql_where=text("is_deleted = false"),
+        ),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    machine_code = Column(String)
-    client_cuit = Column(String)
+    machine_code = Column(String, index=True)
+    client_cuit = Column(String, index=True)
+    # CUIT solo con digitos, para buscar con o sin guiones sin normalizar por fila
+    client_cuit_digits = Column(String, index=True)
     client_name = Column(String)
     client_phone = Column(String)
     client_email = Column(String, nullable=True)
@@ -89,7 +172,7 @@ class Quotation(Base):
     notes = Column(Text, nullable=True)
     client_discount_percent = Column(Float, default=0.0)
     additional_discount_percent = Column(Float, default=0.0)
-    total_discount_percent = Column(Float, default=0.0)
+    total_discount_percent = Column(Float, default=0.0, index=True)
     original_price = Column(Float)
     final_price = Column(Float)
     options_data = Column(Text, nullable=True)  # JSON string con snapshot de opcionales
@@ -97,6 +180,26 @@ class Quotation(Base):
     is_deleted = Column(Boolean, default=False, nullable=False)
     deleted_at = Column(DateTime, nullable=True)
     deleted_by = Column(String, nullable=True)
-    created_at = Column(DateTime, default=lambda: datetime.now(ARG_TZ))
+    # Ver ExchangeRate.fetched_at: default en Python para bases sin la migracion 0005
+    created_at = Column(UTCDateTime(timezone=True), default=_utcnow, server_default=func.now(), index=True)
+
+_CUIT_NON_DIGITS_RE = re.compile(r"\D")
+
+
+def cuit_digits(value):
+    return _CUIT_NON_DIGITS_RE.sub("", value) if value else value
+
+
+@event.listens_for(Quotation, "before_insert")
+@event.listens_for(Quotation, "before_update")
+def _set_client_cuit_digits(mapper, connection, target):
+    target.client_cuit_digits = cuit_digits(target.client_cuit)
+
+
+def init_db():
+    """Crea las tablas faltantes. En produccion el esquema lo maneja `alembic upgrade head`."""
+    Base.metadata.create_all(bind=engine)
+
 
-Base.metadata.create_all(bind=engine) 
+if __name__ == "__main__":
+    init_db()
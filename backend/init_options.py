@@ -5,86 +5,89 @@ Script para inicializar opcionales de ejemplo en la base de datos
 
 import os
 import sys
+from itertools import islice
 sys.path.append(os.path.dirname(__file__))
 
-from db import SessionLocal, Option
+from db import engine, init_db
 
-def init_options():
-    """Inicializa opcionales de ejemplo en la base de datos"""
-    db = SessionLocal()
-    
-    # Verificar si ya existen opcionales
-    existing_options = db.query(Option).count()
-    if existing_options > 0:
-        print(f"Ya existen {existing_options} opcionales en la base de datos. Saltando inicialización.")
-        db.close()
-        return
-    
-    # Opcionales de ejemplo
-    sample_options = [
-        {
-            "name": "Sistema de Frenos Hidráulicos",
-            "price": 2500.0,
-            "description": "Sistema de frenos hidráulicos de alta calidad para mayor seguridad"
-        },
-        {
-            "name": "Luces LED",
-            "price": 800.0,
-            "description": "Kit completo de luces LED para mejor visibilidad nocturna"
-        },
-        {
-            "name": "Pintura Especial",
-            "price": 1200.0,
-            "description": "Pintura especial resistente a la corrosión y rayos UV"
-        },
-        {
-            "name": "Sistema de Suspensión Mejorado",
-            "price": 3500.0,
-            "description": "Sistema de suspensión neumática para mayor confort"
-        },
-        {
-            "name": "GPS Integrado",
-            "price": 1500.0,
-            "description": "Sistema GPS integrado con pantalla táctil"
-        },
-        {
-            "name": "Cubiertas Premium",
-            "price": 2000.0,
-            "description": "Cubiertas premium de alta durabilidad"
-        },
-        {
-            "name": "Sistema de Monitoreo",
-            "price": 1800.0,
-            "description": "Sistema de monitoreo de temperatura y presión"
-        },
-        {
-            "name": "Accesorios de Seguridad",
-            "price": 900.0,
-            "description": "Kit completo de accesorios de seguridad adicionales"
-        }
-    ]
-    
-    # Crear opcionales
-    for option_data in sample_options:
-        option = Option(
-            name=option_data["name"],
-            price=option_data["price"],
-            description=option_data["description"],
-            active=True
-        )
-        db.add(option)
-    
+# Marcador de parámetro según el driver (sqlite3 usa "?", psycopg2 "%s")
+_PARAM = "?" if engine.dialect.paramstyle == "qmark" else "%s"
+# INSERT idempotente: la restricción única de name descarta los ya existentes
+_INSERT_OPTION_SQL = (
+    "INSERT INTO options (name, price, description, active) "
+    f"VALUES ({_PARAM}, {_PARAM}, {_PARAM}, {_PARAM}) "
+    "ON CONFLICT (name) DO NOTHING"
+)
+
+# Opcionales de ejemplo: (nombre, precio, descripción)
+_SAMPLE_OPTIONS = (
+    ("Sistema de Frenos Hidráulicos", 2500.0, "Sistema de frenos hidráulicos de alta calidad para mayor seguridad"),
+    ("Luces LED", 800.0, "Kit completo de luces LED para mejor visibilidad nocturna"),
+    ("Pintura Especial", 1200.0, "Pintura especial resistente a la corrosión y rayos UV"),
+    ("Sistema de Suspensión Mejorado", 3500.0, "Sistema de suspensión neumática para mayor confort"),
+    ("GPS Integrado", 1500.0, "Sistema GPS integrado con pantalla táctil"),
+    ("Cubiertas Premium", 2000.0, "Cubiertas premium de alta durabilidad"),
+    ("Sistema de Monitoreo", 1800.0, "Sistema de monitoreo de temperatura y presión"),
+    ("Accesorios de Seguridad", 900.0, "Kit completo de accesorios de seguridad adicionales"),
+)
+# Filas por executemany; el origen se consume por lotes sin materializarlo entero.
+# Alineado con insertmanyvalues_page_size del engine
+BATCH_SIZE = 500
+
+
+def _chunks(iterable, size):
+    """Agrupa un iterable en listas de hasta `size` elementos"""
+    it = iter(iterable)
+    while batch := list(islice(it, size)):
+        yield batch
+
+def init_options(options=_SAMPLE_OPTIONS):
+    """Inicializa opcionales en la base de datos a partir de tuplas (nombre, precio, descripción)"""
+    init_db()
+
+    created = 0
+    lines = []
     try:
-        db.commit()
-        print(f"Se crearon {len(sample_options)} opcionales de ejemplo exitosamente.")
-        print("\nOpcionales creados:")
-        for option in sample_options:
-            print(f"- {option['name']}: ${option['price']:,.2f}")
+        # Una única transacción sobre una conexión Core (sin Session ni identity map):
+        # commit al salir, rollback ante cualquier error.
+        # exec_driver_sql con una lista de tuplas va directo a cursor.executemany del DBAPI
+        with engine.begin() as conn:
+            # Métodos resueltos una sola vez fuera de los bucles
+            execute = conn.exec_driver_sql
+            add_line = lines.append
+            seen = set()
+            for batch in _chunks(options, BATCH_SIZE):
+                # Nombres del lote que ya existen: no se insertan ni entran en el resumen
+                placeholders = ", ".join([_PARAM] * len(batch))
+                seen.update(name for (name,) in execute(
+                    f"SELECT name FROM options WHERE name IN ({placeholders})",
+                    tuple(name for name, _, _ in batch),
+                ))
+                # Una sola pasada arma las filas del INSERT y las líneas del resumen
+                rows = []
+                add_row = rows.append
+                for name, price, description in batch:
+                    if name in seen:
+                        continue
+                    seen.add(name)
+                    add_row((name, price, description, True))
+                    price_str = format(price, ",.2f")
+                    add_line(f"- {name}: ${price_str}\n")
+                if rows:
+                    created += execute(_INSERT_OPTION_SQL, rows).rowcount
     except Exception as e:
-        db.rollback()
         print(f"Error al crear opcionales: {e}")
-    finally:
-        db.close()
+        return
+
+    if not created:
+        print("Ya existen opcionales en la base de datos. Saltando inicialización.")
+        return
+    # Un solo write en lugar de un print por opcional
+    sys.stdout.write(
+        f"Se crearon {created} opcionales de ejemplo exitosamente.\n"
+        "\nOpcionales de ejemplo:\n"
+        + "".join(lines)
+    )
 
 if __name__ == "__main__":
     init_options() 
\ No newline at end of file
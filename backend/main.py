@@ -1,30 +1,53 @@
 ﻿import sys
 import os
 sys.path.append(os.path.dirname(__file__))
-from fastapi import FastAPI, HTTPException, Depends, status, File, UploadFile, Form, Header, Query
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Depends, status, File, UploadFile, Form, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from fastapi.responses import FileResponse, ORJSONResponse, Response
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBasic, HTTPBasicCredentials, HTTPBearer
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 from datetime import datetime, timedelta
 import jwt
 import os
 import secrets
+import hashlib
+import logging
+import re
+import multiprocessing
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from cachetools import TTLCache
 from typing import List, Optional, Dict
-from pdf_generator import PDFGenerator
+from pdf_generator import PDFGenerator, warm_up as warm_up_pdf_worker
 import json
-from db import engine, SessionLocal, Base, Machine, Quotation, Option, MachineSpec, PaymentCondition, ExchangeRate
-from sqlalchemy.orm import joinedload
-from sqlalchemy import or_, inspect, text, func
+import orjson
+from db import engine, SessionLocal, Base, Machine, Quotation, Option, MachineSpec, PaymentCondition, ExchangeRate, machine_option, init_db, cuit_digits
+from sqlalchemy.orm import joinedload, lazyload, selectinload
+from sqlalchemy import bindparam, case, event, or_, inspect, insert, select, text, func
 from afip_ws import afip_ws, AFIPPersonaData
 from dotenv import load_dotenv
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # ConfiguraciÃ³n JWT
 JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_MINUTES = 15
+JWT_CACHE_TTL = int(os.getenv("JWT_CACHE_TTL", "5"))
+
+# Credenciales de admin leidas una vez; la password se compara por hash en tiempo constante
+_ADMIN_USER = os.getenv("ADMIN_USER", "Torocojo").encode()
+_ADMIN_PASS_HASH = hashlib.sha256(os.getenv("ADMIN_PASS", "ar2810AR").encode()).digest()
+
+# Cache de tokens verificados (clave: sha256 del token crudo)
+_jwt_cache = TTLCache(maxsize=10_000, ttl=JWT_CACHE_TTL)
+_jwt_cache_lock = threading.Lock()
 
 # Pydantic models
 class OptionCreate(BaseModel):
@@ -103,8 +126,165 @@ class AdminToken(BaseModel):
     token_type: str
     expires_in: int
 
+# Modelos de respuesta: limitan lo que se serializa de los objetos ORM
+class OptionOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: str
+    price: float
+    description: Optional[str] = None
+    active: bool
+
+class MachineOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    code: str
+    name: str
+    price: float
+    category: Optional[str] = None
+    description: Optional[str] = None
+    active: bool
+    model_name: Optional[str] = None
+    product_title: Optional[str] = None
+    price_currency: Optional[str] = None
+    options: List[OptionOut] = []
+
+class QuotationOut(BaseModel):
+    """Cotizacion del listado admin; deja afuera columnas internas como client_cuit_digits"""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    machine_code: Optional[str] = None
+    client_cuit: Optional[str] = None
+    client_name: Optional[str] = None
+    client_phone: Optional[str] = None
+    client_email: Optional[str] = None
+    client_company: Optional[str] = None
+    notes: Optional[str] = None
+    client_discount_percent: Optional[float] = None
+    additional_discount_percent: Optional[float] = None
+    total_discount_percent: Optional[float] = None
+    original_price: Optional[float] = None
+    final_price: Optional[float] = None
+    options_data: Optional[str] = None
+    options_total: Optional[float] = None
+    is_deleted: bool
+    deleted_at: Optional[datetime] = None
+    deleted_by: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+_machines_adapter = TypeAdapter(List[MachineOut])
+_machine_adapter = TypeAdapter(MachineOut)
+_options_adapter = TypeAdapter(List[OptionOut])
+_quotations_adapter = TypeAdapter(List[QuotationOut])
+
 # FastAPI app
-app = FastAPI(title="Cotizador Agromaq API", version="1.0.0")
+app = FastAPI(title="Cotizador Agromaq API", version="1.0.0", default_response_class=ORJSONResponse)
+
+# Respuestas JSON ya serializadas por grupo de datos, clave (endpoint, ...). Cada
+# grupo se vacia en cada commit que modifica sus modelos en este proceso; el TTL
+# acota cambios externos. El tipo de cambio vence antes porque se actualiza seguido.
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "60"))
+EXCHANGE_RATE_CACHE_TTL = int(os.getenv("EXCHANGE_RATE_CACHE_TTL", "300"))
+PAYMENT_CONDITIONS_CACHE_TTL = int(os.getenv("PAYMENT_CONDITIONS_CACHE_TTL", "3600"))
+_response_caches = {
+    "catalog": TTLCache(maxsize=1024, ttl=CATALOG_CACHE_TTL),
+    "exchange_rate": TTLCache(maxsize=4, ttl=EXCHANGE_RATE_CACHE_TTL),
+    "payment_conditions": TTLCache(maxsize=4, ttl=PAYMENT_CONDITIONS_CACHE_TTL),
+}
+_cache_versions = dict.fromkeys(_response_caches, 0)
+_cache_lock = threading.Lock()
+
+
+def _invalidate_cache(group: str):
+    with _cache_lock:
+        _cache_versions[group] += 1
+        _response_caches[group].clear()
+
+
+# Cualquier commit que toque estos modelos (endpoints admin, importacion de lista de
+# precios, seed) invalida el cache correspondiente, sin depender de cada endpoint.
+_CACHED_MAPPERS = {
+    inspect(Machine): "catalog",
+    inspect(MachineSpec): "catalog",
+    inspect(Option): "catalog",
+    inspect(PaymentCondition): "payment_conditions",
+    inspect(ExchangeRate): "exchange_rate",
+}
+
+
+def _mark_dirty_caches(session, mappers):
+    dirty = {_CACHED_MAPPERS[mapper] for mapper in mappers if mapper in _CACHED_MAPPERS}
+    if dirty:
+        session.info.setdefault("dirty_caches", set()).update(dirty)
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_caches_on_flush(session, flush_context):
+    _mark_dirty_caches(
+        session,
+        {inspect(obj).mapper for obj in (*session.new, *session.dirty, *session.deleted)},
+    )
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_caches_on_bulk(orm_execute_state):
+    if not orm_execute_state.is_select:
+        _mark_dirty_caches(orm_execute_state.session, orm_execute_state.all_mappers)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_caches_on_commit(session):
+    dirty = session.info.pop("dirty_caches", ())
+    for group in dirty:
+        _invalidate_cache(group)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_dirty_caches(session, previous_transaction):
+    # Un SAVEPOINT deshecho (begin_nested) no anula lo ya flusheado en la transaccion
+    # externa: las marcas se conservan hasta su commit o rollback
+    if previous_transaction.nested:
+        return
+    session.info.pop("dirty_caches", None)
+
+
+def _cached_value(group: str, key: tuple, build):
+    """Devuelve el valor cacheado para `key` o lo arma con `build()`"""
+    cache = _response_caches[group]
+    version = _cache_versions[group]
+    with _cache_lock:
+        value = cache.get(key)
+    if value is None:
+        value = build()
+        with _cache_lock:
+            # Si hubo una mutacion mientras se armaba, no se guarda un valor viejo
+            if version == _cache_versions[group]:
+                cache[key] = value
+    return value
+
+
+def _cached_response(group: str, key: tuple, build) -> Response:
+    """Devuelve el JSON cacheado para `key` o lo arma con `build()` (que retorna bytes)"""
+    return Response(content=_cached_value(group, key, build), media_type="application/json")
+
+
+def _cached_catalog_response(key: tuple, build) -> Response:
+    return _cached_response("catalog", key, build)
+
+
+# Consultas calientes armadas una sola vez; SQLAlchemy reutiliza su SQL compilado
+_LATEST_EXCHANGE_RATE = select(ExchangeRate).order_by(
+    ExchangeRate.fetched_at.desc(), ExchangeRate.id.desc()
+).limit(1)
+_ACTIVE_MACHINE_BY_CODE = select(Machine).where(
+    Machine.code == bindparam("code"), Machine.active == True
+)
+_ACTIVE_PAYMENT_CONDITIONS = select(PaymentCondition).where(
+    PaymentCondition.active == True
+).order_by(PaymentCondition.sort_order)
 
 
 def serialize_machine(machine: Machine) -> dict:
@@ -132,13 +312,15 @@ def serialize_machine(machine: Machine) -> dict:
         ],
     }
 
-# CORS middleware
+# CORS middleware: CORS_ORIGINS es una lista separada por comas. Sin configurar se
+# permite cualquier origen, pero sin credenciales (el navegador rechaza "*" con credenciales).
+CORS_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "").split(",") if origin.strip()]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=CORS_ORIGINS or ["*"],
+    allow_credentials=bool(CORS_ORIGINS),
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_headers=["Authorization", "Content-Type"],
 )
 
 # Security
@@ -170,27 +352,55 @@ def ensure_quotation_soft_delete_columns(db: Session):
         statements.append("ALTER TABLE quotations ADD COLUMN deleted_at TIMESTAMP NULL")
     if "deleted_by" not in columns:
         statements.append("ALTER TABLE quotations ADD COLUMN deleted_by VARCHAR NULL")
+    add_cuit_digits = "client_cuit_digits" not in columns
+    if add_cuit_digits:
+        statements.append("ALTER TABLE quotations ADD COLUMN client_cuit_digits VARCHAR NULL")
+        statements.append(
+            "CREATE INDEX IF NOT EXISTS ix_quotations_client_cuit_digits "
+            "ON quotations (client_cuit_digits)"
+        )
 
     for stmt in statements:
         db.execute(text(stmt))
 
+    if add_cuit_digits:
+        # Misma normalizacion que el modelo al insertar (cualquier separador, no solo guiones)
+        rows = db.execute(
+            text("SELECT id, client_cuit FROM quotations WHERE client_cuit IS NOT NULL")
+        ).all()
+        if rows:
+            db.execute(
+                text("UPDATE quotations SET client_cuit_digits = :digits WHERE id = :id"),
+                [{"id": row.id, "digits": cuit_digits(row.client_cuit)} for row in rows],
+            )
+
     if statements:
         db.commit()
 
 # JWT Token functions
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
+    # exp como epoch entero: PyJWT lo acepta directo, sin aritmetica de datetime
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = int(time.time()) + int(expires_delta.total_seconds())
     else:
-        expire = datetime.utcnow() + timedelta(minutes=JWT_EXPIRATION_MINUTES)
-    to_encode.update({"exp": expire})
+        expire = int(time.time()) + JWT_EXPIRATION_MINUTES * 60
+    to_encode["exp"] = expire
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
 def verify_token(token: str):
+    # Tokens ya verificados: evita repetir HMAC + decode en cada request admin.
+    # Solo se cachean verificaciones exitosas y se respeta el exp del payload.
+    key = hashlib.sha256(token.encode()).digest()
+    with _jwt_cache_lock:
+        payload = _jwt_cache.get(key)
+    if payload is not None and payload.get("exp", 0) > time.time():
+        return payload
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        with _jwt_cache_lock:
+            _jwt_cache[key] = payload
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expirado")
@@ -198,12 +408,14 @@ def verify_token(token: str):
         raise HTTPException(status_code=401, detail="Token invÃ¡lido")
 
 # Authentication dependency
-def get_current_admin(authorization: str = Header(None)):
-    if not authorization or not authorization.startswith("Bearer "):
+bearer = HTTPBearer(auto_error=False)
+
+
+def get_current_admin(creds: Optional[HTTPAuthorizationCredentials] = Depends(bearer)):
+    if creds is None:
         raise HTTPException(status_code=401, detail="Token requerido")
     
-    token = authorization.split(" ")[1]
-    payload = verify_token(token)
+    payload = verify_token(creds.credentials)
     
     # Verificar que es un admin
     if payload.get("role") != "admin":
@@ -215,10 +427,10 @@ def get_current_admin(authorization: str = Header(None)):
 @app.post("/admin/login", response_model=AdminToken)
 def admin_login(login_data: AdminLogin):
     """Login para administradores"""
-    admin_username = os.getenv("ADMIN_USER", "Torocojo")
-    admin_password = os.getenv("ADMIN_PASS", "ar2810AR")
+    user_ok = secrets.compare_digest(login_data.username.encode(), _ADMIN_USER)
+    pass_ok = secrets.compare_digest(hashlib.sha256(login_data.password.encode()).digest(), _ADMIN_PASS_HASH)
     
-    if login_data.username == admin_username and login_data.password == admin_password:
+    if user_ok and pass_ok:
         access_token_expires = timedelta(minutes=JWT_EXPIRATION_MINUTES)
         access_token = create_access_token(
             data={"sub": login_data.username, "role": "admin"},
@@ -244,59 +456,78 @@ def verify_admin_token(admin: dict = Depends(get_current_admin)):
 
 # Initialize components
 pdf_generator = PDFGenerator()
+
+# Pool de procesos para renderizar PDFs: ReportLab es CPU-bound y retiene el GIL.
+# Se crea al primer uso; "spawn" evita heredar threads/conexiones del proceso web.
+# PDF_WORKERS acota cuantos PDFs se arman a la vez (y la memoria que usan).
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or os.cpu_count()
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    if _pdf_pool is None:
+        with _pdf_pool_lock:
+            if _pdf_pool is None:
+                _pdf_pool = ProcessPoolExecutor(
+                    max_workers=PDF_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=warm_up_pdf_worker,
+                )
+    return _pdf_pool
+
+
+def _render_pdf(render, *args):
+    """Ejecuta un metodo de PDFGenerator en el pool de procesos y devuelve el path del PDF"""
+    return _get_pdf_pool().submit(render, *args).result()
+
+
+# Copias planas (picklables) de los objetos ORM que usa el generador de PDF
+def _pdf_machine(machine: Machine) -> SimpleNamespace:
+    return SimpleNamespace(
+        name=machine.name,
+        product_title=machine.product_title,
+        model_name=machine.model_name,
+        description=machine.description,
+        price_currency=machine.price_currency,
+        specs=[SimpleNamespace(spec_text=spec.spec_text) for spec in machine.specs],
+    )
+
+
+def _pdf_option(option: Option) -> SimpleNamespace:
+    return SimpleNamespace(name=option.name, price=option.price)
+
+
+def _pdf_condition(condition: PaymentCondition) -> SimpleNamespace:
+    return SimpleNamespace(name=condition.name, discount_percent=condition.discount_percent)
+
+
+# Condiciones de pago activas para los PDFs, como copias planas: comparten el grupo
+# "payment_conditions" (mismo TTL e invalidacion) con los endpoints que las listan
+def _active_payment_conditions(db: Session) -> list:
+    return _cached_value(
+        "payment_conditions",
+        ("pc:pdf",),
+        lambda: [_pdf_condition(cond) for cond in db.scalars(_ACTIVE_PAYMENT_CONDITIONS)],
+    )
 # Telegram bot desactivado - pendiente migracion a WhatsApp
 
-# Machinery catalog
-MACHINERY_CATALOG = [
-    {
-        "categoria": "Acoplados rurales",
-        "productos": [
-            "Acoplado rural playo",
-            "Acoplado rural vaquero desmontable",
-            "Acoplado rural vaquero desmontable 2",
-            "Acoplado rural vaquero fijo",
-            "Acoplado totalmente desmontable",
-            "Acoplado volcador manual o hidrÃ¡ulico",
-            "Acoplado volcador trivuelo de uso rural"
-        ]
-    },
-    {
-        "categoria": "Acoplados tanque",
-        "productos": [
-            "Acoplado tanque 3000 Lts.",
-            "Acoplado tanque de 1500 Lts.",
-            "Acoplado tanque de plÃ¡stico 12.000 Lts.",
-            "Acoplado tanque de plÃ¡stico 1500 Lts.",
-            "Acoplado tanque de plÃ¡stico 3500 Lts.",
-            "Acoplado tanque de plÃ¡stico 7000 Lts.",
-            "Acoplado tanques rurales"
-        ]
-    },
-    {
-        "categoria": "Tolvas",
-        "productos": [
-            "Acoplado tolva cerealero 4 TT.",
-            "Acoplado tolva cerealero 8 TT.",
-            "Acoplado Tolva para semillas y fertilizantes de uso rural",
-            "Acoplado Tolva Para Semillas Y Fertilizantes De Uso Rural",
-            "Acoplado tolva para semillas y fertilizantes modelo A.T.F. 10",
-            "Acoplado tolva para semillas y fertilizantes modelo A.T.F. 14",
-            "Acoplado tolva para semillas y fertilizantes Modelo A.T.F. 24",
-            "Acoplados tolvas para semillas y fertilizantes Modelo A.T.F. 12"
-        ]
-    },
-    {
-        "categoria": "Cargadores y elevadores",
-        "productos": [
-            "Cargador y transportador de rollos hidrÃ¡ulico T.R.A. 6000",
-            "Elevador de rollos",
-            "GrÃºa giratoria hidrÃ¡ulica multipropÃ³sito de uso rural"
-        ]
-    },
-]
+# Machinery catalog: se lee una sola vez al importar y lo comparten el seed y /machines/catalog
+MACHINERY_BACKUP_PATH = os.path.join(os.path.dirname(__file__), "data_machinery_backup.json")
+try:
+    with open(MACHINERY_BACKUP_PATH, "r", encoding="utf-8") as f:
+        MACHINERY_CATALOG = json.load(f)
+except FileNotFoundError:
+    print(f"Warning: no se encontro {MACHINERY_BACKUP_PATH}, catalogo vacio")
+    MACHINERY_CATALOG = []
+MACHINERY_CATALOG_JSON = orjson.dumps(MACHINERY_CATALOG)
 
 @app.on_event("startup")
 async def startup_event():
+    init_db()
+    logger.debug("DB pool: %s", engine.pool.status())
+
     # Keep legacy DBs compatible when new columns are introduced.
     db = None
     try:
@@ -311,38 +542,46 @@ async def startup_event():
     # Initialize machinery catalog in database
     db = SessionLocal()
     if db.query(Machine).count() == 0:
-        # Leer el catÃ¡logo desde el backup JSON
-        backup_path = os.path.join(os.path.dirname(__file__), "data_machinery_backup.json")
-        with open(backup_path, "r", encoding="utf-8") as f:
-            MACHINERY_CATALOG = json.load(f)
         id_counter = 1
+        rows = []
         for category in MACHINERY_CATALOG:
             for producto in category["productos"]:
                 code = f"{category['categoria'][:3].upper()}{str(id_counter).zfill(3)}"
-                machine = Machine(
-                    code=code,
-                    name=producto,
-                    price=float(10000 + (id_counter * 1000)),  # Sample pricing
-                    category=category["categoria"],
-                    description=f"DescripciÃ³n de {producto}",
-                    active=True
-                )
-                db.add(machine)
+                rows.append({
+                    "code": code,
+                    "name": producto,
+                    "price": float(10000 + (id_counter * 1000)),  # Sample pricing
+                    "category": category["categoria"],
+                    "description": f"DescripciÃ³n de {producto}",
+                    "active": True,
+                })
                 id_counter += 1
+        # Un solo INSERT multi-VALUES en lugar de un db.add por maquina
+        if rows:
+            db.execute(insert(Machine), rows)
         db.commit()
     db.close()
 
+@app.on_event("shutdown")
+def shutdown_event():
+    if _pdf_pool is not None:
+        _pdf_pool.shutdown()
+
 @app.get("/")
 def read_root():
     return {"message": "Agromaq Enhanced Quotation System API", "version": "2.0.0"}
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "timestamp": datetime.utcnow()}
+    return {"status": "healthy", "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())}
 
-@app.get("/machines")
+@app.get("/machines", response_model=List[MachineOut])
 def get_machines(db: Session = Depends(get_db)):
-    return db.query(Machine).filter(Machine.active == True).all()
+    def build():
+        machines = db.query(Machine).filter(Machine.active == True).all()
+        return _machines_adapter.dump_json(_machines_adapter.validate_python(machines, from_attributes=True))
+
+    return _cached_catalog_response(("machines",), build)
 
 @app.get("/admin/machines")
 def get_machines_admin(
@@ -364,7 +603,8 @@ def get_machines_admin(
     
     # Aplicar paginaciÃ³n
     total = query.count()
-    machines = query.options(joinedload(Machine.options)).offset(skip).limit(limit).all()
+    # serialize_machine no usa specs: sin el selectin por defecto del mapper
+    machines = query.options(joinedload(Machine.options), lazyload(Machine.specs)).offset(skip).limit(limit).all()
     
     return {
         "machines": [serialize_machine(machine) for machine in machines],
@@ -375,26 +615,31 @@ def get_machines_admin(
 
 @app.get("/machines/catalog")
 def get_machinery_catalog():
-    return MACHINERY_CATALOG
+    return Response(content=MACHINERY_CATALOG_JSON, media_type="application/json")
 
-@app.get("/machines/{machine_code}")
+@app.get("/machines/{machine_code}", response_model=MachineOut)
 def get_machine_by_code(machine_code: str, db: Session = Depends(get_db)):
-    machine = db.query(Machine).filter(Machine.code == machine_code, Machine.active == True).first()
-    if not machine:
-        raise HTTPException(status_code=404, detail="Machine not found")
-    return machine
+    def build():
+        machine = db.scalars(_ACTIVE_MACHINE_BY_CODE, {"code": machine_code}).first()
+        if not machine:
+            raise HTTPException(status_code=404, detail="Machine not found")
+        return _machine_adapter.dump_json(_machine_adapter.validate_python(machine, from_attributes=True))
+
+    return _cached_catalog_response(("machine", machine_code), build)
 
 @app.get("/admin/machines/{machine_id}")
 def get_machine_admin(machine_id: int, admin: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
     """Obtener una mÃ¡quina especÃ­fica con sus opcionales - solo admin"""
-    machine = db.query(Machine).filter(Machine.id == machine_id).first()
+    machine = db.query(Machine).options(
+        selectinload(Machine.options), lazyload(Machine.specs)
+    ).filter(Machine.id == machine_id).first()
     if not machine:
         raise HTTPException(status_code=404, detail="Machine not found")
     
     # Incluir opcionales asociados
     return serialize_machine(machine)
 
-@app.put("/machines/{machine_code}")
+@app.put("/machines/{machine_code}", response_model=MachineOut)
 def update_machine_price(machine_code: str, machine_update: MachineUpdate, db: Session = Depends(get_db)):
     machine = db.query(Machine).filter(Machine.code == machine_code).first()
     if not machine:
@@ -406,7 +651,7 @@ def update_machine_price(machine_code: str, machine_update: MachineUpdate, db: S
     return machine
 
 @app.post("/generate-quote")
-async def generate_quote(quotation: QuotationCreate, db: Session = Depends(get_db)):
+def generate_quote(quotation: QuotationCreate, db: Session = Depends(get_db)):
     print(f"Received quotation data: {quotation}")
     print(f"Machine code: {quotation.machineCode}")
     print(f"Option IDs: {quotation.option_ids}")
@@ -485,14 +730,18 @@ async def generate_quote(quotation: QuotationCreate, db: Session = Depends(get_d
         total_discount_percent=total_discount_percent,
         original_price=original_price,
         final_price=final_price,
-        options_data=json.dumps(selected_options),
+        options_data=orjson.dumps(selected_options).decode(),
         options_total=options_total
     )
+    # Snapshot antes del commit, que expira la maquina y sus specs ya cargadas
+    pdf_machine = _pdf_machine(machine)
     db.add(db_quotation)
     db.commit()
     
     # Generate PDF
-    pdf_path = await pdf_generator.generate_quotation_pdf(machine, quotation, final_price, selected_options)
+    pdf_path = _render_pdf(
+        pdf_generator.generate_quotation_pdf, pdf_machine, quotation, final_price, selected_options
+    )
     
     return FileResponse(
         pdf_path,
@@ -501,32 +750,47 @@ async def generate_quote(quotation: QuotationCreate, db: Session = Depends(get_d
     )
 
 @app.post("/quotations")
-async def create_quotation_multiple(quotation: QuotationCreateMultiple, db: Session = Depends(get_db)):
+def create_quotation_multiple(quotation: QuotationCreateMultiple, db: Session = Depends(get_db)):
     """Crear cotizaciÃ³n con mÃºltiples items"""
     print(f"Received multiple quotation data: {quotation}")
     
     # Validar que todas las mÃ¡quinas existen
     machine_codes = [item.machine_code for item in quotation.items]
+    # Chequeo barato (solo codes) antes de hidratar maquinas con specs y opcionales
+    found_codes = {
+        code for (code,) in db.query(Machine.code).filter(
+            Machine.code.in_(machine_codes),
+            Machine.active == True
+        )
+    }
+    if len(found_codes) != len(set(machine_codes)):
+        missing_codes = [code for code in machine_codes if code not in found_codes]
+        raise HTTPException(status_code=404, detail=f"MÃ¡quinas no encontradas: {missing_codes}")
+    
+    # selectinload: una consulta IN por coleccion, sin el producto cartesiano de dos joinedload
     machines = db.query(Machine).options(
-        joinedload(Machine.specs)
+        selectinload(Machine.specs),
+        selectinload(Machine.options),
     ).filter(
-        Machine.code.in_(machine_codes),
+        Machine.code.in_(found_codes),
         Machine.active == True
     ).all()
     
-    if len(machines) != len(machine_codes):
-        found_codes = [m.code for m in machines]
-        missing_codes = [code for code in machine_codes if code not in found_codes]
-        raise HTTPException(status_code=404, detail=f"MÃ¡quinas no encontradas: {missing_codes}")
-    
     # Crear diccionario de mÃ¡quinas para acceso rÃ¡pido
     machines_dict = {m.code: m for m in machines}
     
-    # Procesar cada item
-    all_selected_options = []
+    # Procesar cada item (opcionales guardados por posicion del item)
+    item_options_by_idx = []
     total_machines_subtotal = 0.0
     total_options_subtotal = 0.0
     
+    # Traer todos los opcionales de todos los items en una sola consulta
+    all_option_ids = {option_data.id for item in quotation.items for option_data in item.options}
+    options_by_id = {
+        option.id: option
+        for option in db.query(Option).filter(Option.id.in_(all_option_ids), Option.active == True).all()
+    } if all_option_ids else {}
+    
     for item in quotation.items:
         machine = machines_dict[item.machine_code]
         
@@ -537,10 +801,7 @@ async def create_quotation_multiple(quotation: QuotationCreateMultiple, db: Sess
         # Procesar opcionales del item
         item_options = []
         for option_data in item.options:
-            option = db.query(Option).filter(
-                Option.id == option_data.id, 
-                Option.active == True
-            ).first()
+            option = options_by_id.get(option_data.id)
             
             if not option:
                 raise HTTPException(status_code=404, detail=f"Opcional {option_data.id} no encontrado")
@@ -556,7 +817,7 @@ async def create_quotation_multiple(quotation: QuotationCreateMultiple, db: Sess
                 "subtotal": option_subtotal
             })
         
-        all_selected_options.extend(item_options)
+        item_options_by_idx.append(item_options)
     
     # Calcular descuentos
     subtotal_before_discounts = total_machines_subtotal + total_options_subtotal
@@ -585,7 +846,7 @@ async def create_quotation_multiple(quotation: QuotationCreateMultiple, db: Sess
         total_discount_percent=total_discount_percent,
         original_price=subtotal_before_discounts,
         final_price=final_price,
-        options_data=json.dumps({
+        options_data=orjson.dumps({
             "items": [
                 {
                     "machine_code": item.machine_code,
@@ -601,12 +862,9 @@ async def create_quotation_multiple(quotation: QuotationCreateMultiple, db: Sess
                             "price": opt["price"],
                             "quantity": opt["quantity"],
                             "subtotal": opt["subtotal"]
-                        } for opt in all_selected_options if any(
-                            machines_dict[item.machine_code].options and 
-                            opt["option_id"] == option.id for option in machines_dict[item.machine_code].options
-                        )
+                        } for opt in item_options_by_idx[idx]
                     ]
-                } for item in quotation.items
+                } for idx, item in enumerate(quotation.items)
             ],
             "totals": {
                 "machines_subtotal": total_machines_subtotal,
@@ -615,34 +873,32 @@ async def create_quotation_multiple(quotation: QuotationCreateMultiple, db: Sess
                 "total_discount_percent": total_discount_percent,
                 "final_price": final_price
             }
-        }),
+        }).decode(),
         options_total=total_options_subtotal
     )
     
-    db.add(db_quotation)
-    db.commit()
-    db.refresh(db_quotation)
-    
-    # Construir items para el generador de PDF
-    payment_conditions = db.query(PaymentCondition).filter(
-        PaymentCondition.active == True
-    ).order_by(PaymentCondition.sort_order).all()
+    # Construir items para el generador de PDF antes del commit: el commit expira las
+    # maquinas y opcionales cargados arriba y cada acceso volveria a hacer SELECT
+    payment_conditions = _active_payment_conditions(db)
 
     pdf_items = []
     for item in quotation.items:
         machine = machines_dict[item.machine_code]
         item_final_price = item.unit_price * item.quantity * (1 - item.discount_percent / 100)
-        # Obtener los Option objects para este item
-        opt_ids = [opt_data.id for opt_data in item.options]
-        opts = db.query(Option).filter(Option.id.in_(opt_ids)).all() if opt_ids else []
+        # Obtener los Option objects para este item (ya cargados arriba)
+        opts = [options_by_id[opt_id] for opt_id in dict.fromkeys(opt_data.id for opt_data in item.options)]
         pdf_items.append({
-            "machine": machine,
+            "machine": _pdf_machine(machine),
             "final_price": item_final_price,
-            "selected_options": opts,
+            "selected_options": [_pdf_option(opt) for opt in opts],
         })
 
+    db.add(db_quotation)
+    db.commit()
+
     # Generar PDF
-    pdf_path = await pdf_generator.generate_multiple_quotation_pdf(
+    pdf_path = _render_pdf(
+        pdf_generator.generate_multiple_quotation_pdf,
         pdf_items,
         quotation,
         payment_conditions,
@@ -654,6 +910,10 @@ async def create_quotation_multiple(quotation: QuotationCreateMultiple, db: Sess
         filename=f"cotizacion-multiple-{quotation.client_name.replace(' ', '-')}.pdf"
     )
 
+# CUIT completo: 11 digitos con separadores opcionales (20-17855887-1, 20.17855887.1, ...)
+_FULL_CUIT_RE = re.compile(r"\d{2}[-. /]?\d{8}[-. /]?\d")
+
+
 @app.get("/quotations")
 def get_quotations(
     include_deleted: bool = Query(default=False),
@@ -671,18 +931,23 @@ def get_quotations(
 
     if q:
         q_value = q.strip()
-        term = f"%{q_value}%"
-        normalized_digits = "".join(ch for ch in q_value if ch.isdigit())
-        normalized_cuit_db = func.replace(func.replace(Quotation.client_cuit, "-", ""), " ", "")
-        filters = [
-            Quotation.client_name.ilike(term),
-            Quotation.client_cuit.ilike(term),
-            Quotation.machine_code.ilike(term),
-            Quotation.client_company.ilike(term),
-        ]
-        if normalized_digits:
-            filters.append(normalized_cuit_db.ilike(f"%{normalized_digits}%"))
-        query = query.filter(or_(*filters))
+        normalized_digits = cuit_digits(q_value)
+        if _FULL_CUIT_RE.fullmatch(q_value):
+            # CUIT completo, con o sin separadores: igualdad sobre la columna indexada
+            query = query.filter(Quotation.client_cuit_digits == normalized_digits)
+        else:
+            term = f"%{q_value}%"
+            filters = [
+                Quotation.client_name.ilike(term),
+                Quotation.client_cuit.ilike(term),
+                Quotation.machine_code.ilike(term),
+                Quotation.client_company.ilike(term),
+            ]
+            if normalized_digits:
+                # CUIT parcial (p. ej. el DNI): substring sobre la columna precalculada,
+                # sin REPLACE por fila en la consulta
+                filters.append(Quotation.client_cuit_digits.like(f"%{normalized_digits}%"))
+            query = query.filter(or_(*filters))
 
     total = query.count()
 
@@ -697,7 +962,7 @@ def get_quotations(
     )
 
     return {
-        "items": items,
+        "items": _quotations_adapter.validate_python(items, from_attributes=True),
         "total": total,
         "limit": limit,
         "offset": offset,
@@ -749,8 +1014,11 @@ def restore_quotation(
 
 @app.get("/quotations/stats")
 def get_quotation_stats(admin: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
-    total_quotations = db.query(Quotation).count()
-    total_with_discount = db.query(Quotation).filter(Quotation.total_discount_percent > 0).count()
+    # Un solo SELECT con agregacion condicional en lugar de dos COUNT
+    total_quotations, total_with_discount = db.query(
+        func.count(Quotation.id),
+        func.coalesce(func.sum(case((Quotation.total_discount_percent > 0, 1), else_=0)), 0),
+    ).one()
 
     return {
         "total_quotations": total_quotations,
@@ -759,17 +1027,21 @@ def get_quotation_stats(admin: dict = Depends(get_current_admin), db: Session =
     }
 
 # Endpoints para opcionales
-@app.get("/options")
+@app.get("/options", response_model=List[OptionOut])
 def get_options(db: Session = Depends(get_db)):
     """Obtener todos los opcionales activos"""
-    return db.query(Option).filter(Option.active == True).all()
+    def build():
+        options = db.query(Option).filter(Option.active == True).all()
+        return _options_adapter.dump_json(_options_adapter.validate_python(options, from_attributes=True))
+
+    return _cached_catalog_response(("options",), build)
 
-@app.get("/admin/options")
+@app.get("/admin/options", response_model=List[OptionOut])
 def get_options_admin(admin: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
     """Obtener todos los opcionales (incluyendo inactivos) - solo admin"""
     return db.query(Option).all()
 
-@app.post("/admin/options")
+@app.post("/admin/options", response_model=OptionOut)
 def create_option(option: OptionCreate, admin: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
     """Crear un nuevo opcional - solo admin"""
     db_option = Option(
@@ -783,7 +1055,7 @@ def create_option(option: OptionCreate, admin: dict = Depends(get_current_admin)
     db.refresh(db_option)
     return db_option
 
-@app.put("/admin/options/{option_id}")
+@app.put("/admin/options/{option_id}", response_model=OptionOut)
 def update_option(option_id: int, option_update: OptionUpdate, admin: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
     """Actualizar un opcional - solo admin"""
     db_option = db.query(Option).filter(Option.id == option_id).first()
@@ -823,6 +1095,14 @@ def create_machine(machine: MachineCreate, admin: dict = Depends(get_current_adm
     if existing_machine:
         raise HTTPException(status_code=400, detail="Machine code already exists")
     
+    # Opcionales si se proporcionan: la maquina se crea ya con ellos, en un solo commit
+    options = []
+    if machine.option_ids:
+        options = db.query(Option).filter(
+            Option.id.in_(machine.option_ids), 
+            Option.active == True
+        ).all()
+    
     # Crear la mÃ¡quina
     db_machine = Machine(
         code=machine.code,
@@ -830,22 +1110,12 @@ def create_machine(machine: MachineCreate, admin: dict = Depends(get_current_adm
         price=machine.price,
         category=machine.category,
         description=machine.description,
-        active=True
+        active=True,
+        options=options
     )
     db.add(db_machine)
     db.commit()
-    db.refresh(db_machine)
-    
-    # Asignar opcionales si se proporcionan
-    if machine.option_ids:
-        options = db.query(Option).filter(
-            Option.id.in_(machine.option_ids), 
-            Option.active == True
-        ).all()
-        db_machine.options = options
-        db.commit()
-        db.refresh(db_machine)
-    
+    # La respuesta ya trae los opcionales: no hace falta un GET aparte
     db.refresh(db_machine)
     return serialize_machine(db_machine)
 
@@ -886,7 +1156,6 @@ def update_machine(machine_id: int, machine_update: MachineUpdate, admin: dict =
     
     db.commit()
     db.refresh(db_machine)
-    db.refresh(db_machine)
     return serialize_machine(db_machine)
 
 @app.delete("/admin/machines/{machine_id}")
@@ -900,16 +1169,18 @@ def deactivate_machine(machine_id: int, admin: dict = Depends(get_current_admin)
     db.commit()
     return {"message": "Machine deactivated successfully"}
 
-@app.get("/machines/{machine_code}/options")
+@app.get("/machines/{machine_code}/options", response_model=List[OptionOut])
 def get_machine_options(machine_code: str, db: Session = Depends(get_db)):
     """Obtener opcionales de una mÃ¡quina especÃ­fica"""
-    machine = db.query(Machine).filter(Machine.code == machine_code, Machine.active == True).first()
-    if not machine:
-        raise HTTPException(status_code=404, detail="Machine not found")
-    
-    return machine.options
+    def build():
+        machine = db.scalars(_ACTIVE_MACHINE_BY_CODE, {"code": machine_code}).first()
+        if not machine:
+            raise HTTPException(status_code=404, detail="Machine not found")
+        return _options_adapter.dump_json(_options_adapter.validate_python(machine.options, from_attributes=True))
 
-@app.put("/admin/machines/{machine_code}/options")
+    return _cached_catalog_response(("machine_options", machine_code), build)
+
+@app.put("/admin/machines/{machine_code}/options", response_model=MachineOut)
 def update_machine_options(machine_code: str, option_ids: List[int], admin: dict = Depends(get_current_admin), db: Session = Depends(get_db)):
     """Actualizar opcionales de una mÃ¡quina - solo admin"""
     machine = db.query(Machine).filter(Machine.code == machine_code).first()
@@ -933,17 +1204,20 @@ def update_machine_options(machine_code: str, option_ids: List[int], admin: dict
 @app.get("/admin/exchange-rate")
 def get_exchange_rate(db: Session = Depends(get_db), admin: dict = Depends(get_current_admin)):
     """Retorna el tipo de cambio vigente (Ãºltimo guardado en DB)."""
-    rate = db.query(ExchangeRate).order_by(ExchangeRate.fetched_at.desc()).first()
-    if not rate:
-        return {"rate": None, "source": None, "fetched_at": None}
-    return {
-        "id": rate.id,
-        "rate": rate.rate,
-        "source": rate.source,
-        "currency_from": rate.currency_from,
-        "currency_to": rate.currency_to,
-        "fetched_at": rate.fetched_at.isoformat() if rate.fetched_at else None,
-    }
+    def build():
+        rate = db.scalars(_LATEST_EXCHANGE_RATE).first()
+        if not rate:
+            return orjson.dumps({"rate": None, "source": None, "fetched_at": None})
+        return orjson.dumps({
+            "id": rate.id,
+            "rate": rate.rate,
+            "source": rate.source,
+            "currency_from": rate.currency_from,
+            "currency_to": rate.currency_to,
+            "fetched_at": rate.fetched_at.isoformat() if rate.fetched_at else None,
+        })
+
+    return _cached_response("exchange_rate", ("fx:usd_ars",), build)
 
 
 @app.post("/admin/exchange-rate/manual")
@@ -978,7 +1252,7 @@ def fetch_exchange_rate_bna(
     result = get_usd_ars_rate()
     if result["rate"] is None:
         # Fallback: devolver ultimo tipo de cambio guardado para evitar cortar la operacion.
-        cached_rate = db.query(ExchangeRate).order_by(ExchangeRate.fetched_at.desc()).first()
+        cached_rate = db.scalars(_LATEST_EXCHANGE_RATE).first()
         if cached_rate:
             return {
                 "rate": cached_rate.rate,
@@ -1016,26 +1290,30 @@ def get_payment_conditions(
     admin: dict = Depends(get_current_admin)
 ):
     """Lista todas las condiciones de pago."""
-    conditions = db.query(PaymentCondition).order_by(PaymentCondition.sort_order).all()
-    return [
-        {
-            "id": c.id, "name": c.name, "discount_percent": c.discount_percent,
-            "description": c.description, "active": c.active, "sort_order": c.sort_order,
-        }
-        for c in conditions
-    ]
+    def build():
+        conditions = db.query(PaymentCondition).order_by(PaymentCondition.sort_order).all()
+        return orjson.dumps([
+            {
+                "id": c.id, "name": c.name, "discount_percent": c.discount_percent,
+                "description": c.description, "active": c.active, "sort_order": c.sort_order,
+            }
+            for c in conditions
+        ])
+
+    return _cached_response("payment_conditions", ("pc:all",), build)
 
 
 @app.get("/payment-conditions")
 def get_payment_conditions_public(db: Session = Depends(get_db)):
     """Lista las condiciones de pago activas (endpoint pÃºblico para el formulario)."""
-    conditions = db.query(PaymentCondition).filter(
-        PaymentCondition.active == True
-    ).order_by(PaymentCondition.sort_order).all()
-    return [
-        {"id": c.id, "name": c.name, "discount_percent": c.discount_percent}
-        for c in conditions
-    ]
+    def build():
+        conditions = db.scalars(_ACTIVE_PAYMENT_CONDITIONS).all()
+        return orjson.dumps([
+            {"id": c.id, "name": c.name, "discount_percent": c.discount_percent}
+            for c in conditions
+        ])
+
+    return _cached_response("payment_conditions", ("pc:active",), build)
 
 
 @app.post("/admin/payment-conditions")
@@ -1090,7 +1368,8 @@ def delete_payment_condition(
 # ---------------------------------------------------------------------------
 
 @app.post("/admin/price-list/preview")
-async def preview_price_list(
+def preview_price_list(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     admin: dict = Depends(get_current_admin)
 ):
@@ -1102,25 +1381,26 @@ async def preview_price_list(
         raise HTTPException(status_code=400, detail="El archivo debe ser un PDF")
 
     try:
-        from pdf_parser import parse_price_list_pdf, parse_payment_conditions, HAS_PDFPLUMBER
-        if not HAS_PDFPLUMBER:
-            raise HTTPException(status_code=500, detail="pdfplumber no instalado en el servidor")
+        from pdf_parser import parse_price_list, HAS_PDF_BACKEND
+        if not HAS_PDF_BACKEND:
+            raise HTTPException(status_code=500, detail="pymupdf/pdfplumber no instalado en el servidor")
     except ImportError:
         raise HTTPException(status_code=500, detail="MÃ³dulo pdf_parser no disponible")
 
-    # Guardar temporalmente
+    # Guardar temporalmente, en bloques de 1 MiB (el endpoint es sync: corre en el
+    # threadpool, asi que ni la copia ni el parseo bloquean el event loop)
     import tempfile, shutil
     with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        shutil.copyfileobj(file.file, tmp)
+        shutil.copyfileobj(file.file, tmp, 1 << 20)
         tmp_path = tmp.name
 
+    # El temporal se borra despues de enviar la respuesta (o ya mismo si falla el parseo)
     try:
-        products = parse_price_list_pdf(tmp_path)
-        payment_conditions = parse_payment_conditions(tmp_path)
+        products, payment_conditions = parse_price_list(tmp_path)
     except Exception as e:
-        raise HTTPException(status_code=422, detail=f"Error parseando PDF: {e}")
-    finally:
         os.unlink(tmp_path)
+        raise HTTPException(status_code=422, detail=f"Error parseando PDF: {e}")
+    background_tasks.add_task(os.unlink, tmp_path)
 
     return {
         "products": products,
@@ -1131,7 +1411,7 @@ async def preview_price_list(
 
 
 @app.post("/admin/price-list/confirm")
-async def confirm_price_list(
+def confirm_price_list(
     payload: dict,
     db: Session = Depends(get_db),
     admin: dict = Depends(get_current_admin)
@@ -1154,79 +1434,107 @@ async def confirm_price_list(
     if not products:
         raise HTTPException(status_code=400, detail="No hay productos para importar")
 
+    # Todo (borrado, productos, specs, opcionales y condiciones) va en una sola
+    # transaccion: un solo commit/fsync, y si algo falla no queda el catalogo a medias
+    errors = [
+        f"Producto sin cÃ³digo: {p.get('name', '?')}"
+        for p in products if not (p.get("code") or "").strip()
+    ]
+    products = [p for p in products if (p.get("code") or "").strip()]
+
     if replace_existing:
-        # Borrar specs primero (no hay cascade automÃ¡tico en SQLite)
-        db.query(MachineSpec).delete()
-        db.query(Machine).delete()
-        db.commit()
+        # Borrar specs y asociaciones primero (no hay cascade automÃ¡tico en SQLite).
+        # synchronize_session=False: DELETE directo, sin evaluar objetos de la sesion
+        db.query(MachineSpec).delete(synchronize_session=False)
+        db.execute(machine_option.delete())
+        db.query(Machine).delete(synchronize_session=False)
 
     imported = 0
     updated = 0
-    errors = []
+    # Specs y opcionales se acumulan y se insertan en lote al final
+    specs_by_machine = {}
+    opts_to_add = []
+    existing_opt_names = {name for (name,) in db.query(Option.name)}
+    codes = {p["code"].strip() for p in products}
+    existing_map = {
+        m.code: m for m in db.query(Machine).filter(Machine.code.in_(codes))
+    } if codes else {}
 
     for p in products:
-        code = (p.get("code") or "").strip()
-        if not code:
-            errors.append(f"Producto sin cÃ³digo: {p.get('name', '?')}")
-            continue
+        code = p["code"].strip()
 
+        # Savepoint por producto: un error (tambien en specs u opcionales mal formados)
+        # descarta solo ese producto y queda en errors
         try:
-            existing = db.query(Machine).filter(Machine.code == code).first()
-            if existing:
-                existing.name = p.get("name", existing.name)
-                existing.price = p.get("price") or 0.0
-                existing.category = p.get("category", existing.category)
-                existing.model_name = p.get("model_name", "")
-                existing.product_title = p.get("product_title", "")
-                existing.price_currency = p.get("price_currency", "USD")
-                existing.active = True
-                machine = existing
-                updated += 1
-            else:
-                machine = Machine(
-                    code=code,
-                    name=p.get("name", code),
-                    price=p.get("price") or 0.0,
-                    category=p.get("category", ""),
-                    description="",
-                    model_name=p.get("model_name", ""),
-                    product_title=p.get("product_title", ""),
-                    price_currency=p.get("price_currency", "USD"),
-                    active=True,
-                )
-                db.add(machine)
-                db.flush()  # para obtener machine.id
-                imported += 1
-
-            # Reemplazar specs
-            db.query(MachineSpec).filter(MachineSpec.machine_id == machine.id).delete()
-            for i, spec_text in enumerate(p.get("specs", [])):
-                if spec_text.strip():
-                    db.add(MachineSpec(
-                        machine_id=machine.id,
-                        spec_text=spec_text.strip(),
-                        sort_order=i,
-                    ))
-
-            # Importar opcionales como Option global si no existen
-            for opt in p.get("optionals", []):
-                opt_name = opt.get("name", "").strip()
-                opt_price = opt.get("price") or 0.0
-                if not opt_name:
-                    continue
-                existing_opt = db.query(Option).filter(Option.name == opt_name).first()
-                if not existing_opt:
-                    db.add(Option(name=opt_name, price=opt_price, description="", active=True))
-
-            db.commit()
-
+            with db.begin_nested():
+                existing = existing_map.get(code)
+                if existing:
+                    existing.name = p.get("name", existing.name)
+                    existing.price = p.get("price") or 0.0
+                    existing.category = p.get("category", existing.category)
+                    existing.model_name = p.get("model_name", "")
+                    existing.product_title = p.get("product_title", "")
+                    existing.price_currency = p.get("price_currency", "USD")
+                    existing.active = True
+                    machine = existing
+                else:
+                    machine = Machine(
+                        code=code,
+                        name=p.get("name", code),
+                        price=p.get("price") or 0.0,
+                        category=p.get("category", ""),
+                        description="",
+                        model_name=p.get("model_name", ""),
+                        product_title=p.get("product_title", ""),
+                        price_currency=p.get("price_currency", "USD"),
+                        active=True,
+                    )
+                    db.add(machine)
+                    db.flush()  # para obtener machine.id
+
+                # Reemplazar specs (si el codigo se repite, gana la ultima aparicion)
+                specs = [
+                    {"machine_id": machine.id, "spec_text": spec_text.strip(), "sort_order": i}
+                    for i, spec_text in enumerate(p.get("specs", []))
+                    if spec_text.strip()
+                ]
+
+                # Importar opcionales como Option global si no existen
+                new_opts = {}
+                for opt in p.get("optionals", []):
+                    opt_name = opt.get("name", "").strip()
+                    if not opt_name or opt_name in existing_opt_names or opt_name in new_opts:
+                        continue
+                    new_opts[opt_name] = {
+                        "name": opt_name, "price": opt.get("price") or 0.0,
+                        "description": "", "active": True,
+                    }
         except Exception as e:
-            db.rollback()
             errors.append(f"Error importando {code}: {e}")
+            continue
+
+        if existing:
+            updated += 1
+        else:
+            imported += 1
+            existing_map[code] = machine
+        specs_by_machine[machine.id] = specs
+        existing_opt_names.update(new_opts)
+        opts_to_add.extend(new_opts.values())
+
+    if specs_by_machine:
+        db.query(MachineSpec).filter(
+            MachineSpec.machine_id.in_(specs_by_machine)
+        ).delete(synchronize_session=False)
+        specs_to_add = [spec for specs in specs_by_machine.values() for spec in specs]
+        if specs_to_add:
+            db.execute(insert(MachineSpec), specs_to_add)
+    if opts_to_add:
+        db.execute(insert(Option), opts_to_add)
 
     # Importar condiciones de pago
     if payment_conditions:
-        db.query(PaymentCondition).delete()
+        db.query(PaymentCondition).delete(synchronize_session=False)
         for cond in payment_conditions:
             db.add(PaymentCondition(
                 name=cond.get("name", ""),
@@ -1235,7 +1543,7 @@ async def confirm_price_list(
                 sort_order=cond.get("sort_order", 0),
                 active=True,
             ))
-        db.commit()
+    db.commit()
 
     return {
         "imported": imported,
@@ -1251,23 +1559,33 @@ def list_machines_admin(
     admin: dict = Depends(get_current_admin)
 ):
     """Lista todas las mÃ¡quinas (incluyendo inactivas) con specs y opcionales."""
-    machines = db.query(Machine).order_by(Machine.category, Machine.name).all()
-    result = []
-    for m in machines:
-        result.append({
-            "id": m.id,
-            "code": m.code,
-            "name": m.name,
-            "price": m.price,
-            "category": m.category,
-            "model_name": m.model_name,
-            "product_title": m.product_title,
-            "price_currency": m.price_currency,
-            "active": m.active,
-            "specs": [{"text": s.spec_text, "order": s.sort_order} for s in m.specs],
-            "options": [{"id": o.id, "name": o.name, "price": o.price} for o in m.options],
-        })
-    return result
+    # Solo columnas (sin objetos ORM): maquinas, specs y opcionales en tres consultas
+    # planas, agrupadas por machine_id en una pasada
+    machines = db.execute(
+        select(
+            Machine.id, Machine.code, Machine.name, Machine.price, Machine.category,
+            Machine.model_name, Machine.product_title, Machine.price_currency, Machine.active,
+        ).order_by(Machine.category, Machine.name)
+    ).mappings().all()
+
+    specs_by_machine = defaultdict(list)
+    for machine_id, spec_text, sort_order in db.execute(
+        select(MachineSpec.machine_id, MachineSpec.spec_text, MachineSpec.sort_order)
+        .order_by(MachineSpec.machine_id, MachineSpec.sort_order, MachineSpec.id)
+    ):
+        specs_by_machine[machine_id].append({"text": spec_text, "order": sort_order})
+
+    options_by_machine = defaultdict(list)
+    for machine_id, option_id, name, price in db.execute(
+        select(machine_option.c.machine_id, Option.id, Option.name, Option.price)
+        .join(Option, Option.id == machine_option.c.option_id)
+    ):
+        options_by_machine[machine_id].append({"id": option_id, "name": name, "price": price})
+
+    return [
+        {**m, "specs": specs_by_machine.get(m["id"], []), "options": options_by_machine.get(m["id"], [])}
+        for m in machines
+    ]
 
 
 @app.get("/api/afip/client/{cuit}", response_model=AFIPPersonaData)
@@ -9,9 +9,11 @@ from reportlab.lib.colors import Color
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from datetime import datetime
+from functools import lru_cache
 import tempfile
+import io
 import os
-from timezone_utils import get_arg_tz
+from timezone_utils import ARG_TZ
 
 AGROMAQ_GREEN = Color(0.176, 0.314, 0.086)   # #2D5016
 AGROMAQ_YELLOW = Color(0.957, 0.816, 0.247)  # #F4D03F
@@ -23,10 +25,11 @@ MESES = [
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LOGO_PATH = os.path.join(BASE_DIR, './assets/pdflogo.png')
-ARG_TZ = get_arg_tz()
 
 
+@lru_cache(maxsize=1)
 def _build_styles():
+    """Estilos del documento; se arman una vez por proceso y se comparten entre renders."""
     styles = getSampleStyleSheet()
     return {
         'title': ParagraphStyle('Title', parent=styles['Heading1'], fontSize=22,
@@ -54,10 +57,21 @@ def _build_styles():
     }
 
 
+@lru_cache(maxsize=1)
+def _logo_bytes():
+    """PNG del logo leido una vez por proceso (None si no existe)."""
+    try:
+        with open(LOGO_PATH, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
 def _add_header(story, styles):
     """Agrega logo + fecha + 'COTIZACION'."""
-    if os.path.exists(LOGO_PATH):
-        logo_img = Image(LOGO_PATH, width=300, height=None)
+    logo = _logo_bytes()
+    if logo is not None:
+        logo_img = Image(io.BytesIO(logo), width=300, height=None)
         logo_img.hAlign = 'CENTER'
         story.append(logo_img)
     else:
@@ -89,6 +103,13 @@ def _add_client(story, styles, quotation_data):
     story.append(Spacer(1, 10))
 
 
+@lru_cache(maxsize=4096)
+def _format_price(value, currency, decimals=0):
+    """'U$S 1.234' o '$1.234': miles con punto, como en la lista de precios."""
+    amount = f"{value:,.{decimals}f}".replace(',', '.')
+    return f"U$S {amount}" if currency == 'USD' else f"${amount}"
+
+
 def _add_machine_block(story, styles, machine, final_price, selected_options=None):
     """
     Agrega un bloque de máquina: título, modelo, specs, opcionales, precio.
@@ -120,30 +141,26 @@ def _add_machine_block(story, styles, machine, final_price, selected_options=Non
             story.append(Paragraph(machine.description, styles['normal']))
     story.append(Spacer(1, 10))
 
+    currency = getattr(machine, 'price_currency', 'USD')
+
     # Opcionales seleccionados
     if selected_options:
         story.append(Paragraph('<b>Opcionales incluidos:</b>', styles['normal']))
         for opt in selected_options:
             opt_name = getattr(opt, 'name', str(opt))
-            opt_price = getattr(opt, 'price', 0)
-            currency = getattr(machine, 'price_currency', 'USD')
-            price_str = f"U$S {opt_price:,.2f}".replace(',', '.') if currency == 'USD' else f"${opt_price:,.2f}".replace(',', '.')
+            price_str = _format_price(getattr(opt, 'price', 0), currency, 2)
             story.append(Paragraph(f'• {opt_name} ........... {price_str}', styles['bullet']))
         story.append(Spacer(1, 8))
 
     # Precio
-    currency = getattr(machine, 'price_currency', 'USD')
     if final_price is not None:
-        if currency == 'USD':
-            price_display = f"U$S {int(final_price):,}".replace(',', '.')
-        else:
-            price_display = f"${int(final_price):,}".replace(',', '.')
+        price_display = _format_price(int(final_price), currency)
     else:
         price_display = 'Consultar'
 
+    # Relleno con puntos hasta 130 caracteres (con ".=" al final), al menos un punto
     total_length = 130
-    puntos = '.' * max(1, total_length - len(price_display) - 2)
-    price_line = f"{puntos}{price_display}.="
+    price_line = f".{price_display:.>{total_length - 3}}.="
     story.append(Paragraph(price_line, styles['price']))
     story.append(Spacer(1, 15))
 
@@ -175,13 +192,19 @@ def _add_footer(story, styles):
     story.append(Paragraph('E-mail: ventas@agromaq.com.ar – Web: www.agromaq.com.ar', styles['footer']))
 
 
+def warm_up():
+    """Arma estilos y logo al iniciar un worker, para que el primer PDF no pague ese costo."""
+    _build_styles()
+    _logo_bytes()
+
+
 class PDFGenerator:
     def __init__(self):
         self.agromaq_green = AGROMAQ_GREEN
         self.agromaq_yellow = AGROMAQ_YELLOW
 
-    async def generate_quotation_pdf(self, machine, quotation_data, final_price,
-                                     selected_options=None, payment_conditions=None):
+    def generate_quotation_pdf(self, machine, quotation_data, final_price,
+                               selected_options=None, payment_conditions=None):
         """
         Genera PDF de cotización para UNA máquina.
 
@@ -214,7 +237,7 @@ class PDFGenerator:
         doc.build(story)
         return pdf_path
 
-    async def generate_multiple_quotation_pdf(self, items, quotation_data, payment_conditions=None):
+    def generate_multiple_quotation_pdf(self, items, quotation_data, payment_conditions=None):
         """
         Genera PDF de cotización para MÚLTIPLES máquinas en un solo documento.
 
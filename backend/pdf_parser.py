@@ -17,9 +17,16 @@ Patron tipico por pagina:
   OPCIONALES PRECIO                      <- seccion de opcionales
   item 1 ... U$S X.=
 """
+import os
 import re
 import logging
-from typing import Optional
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import repeat
+from typing import Iterator, NamedTuple, Optional
 
 try:
     import pdfplumber
@@ -27,13 +34,27 @@ try:
 except ImportError:
     HAS_PDFPLUMBER = False
 
+# PyMuPDF (nucleo en C) extrae el texto mucho mas rapido; si esta instalado se prefiere.
+# Versiones viejas solo exponen el modulo como `fitz`.
+try:
+    import pymupdf
+    HAS_PYMUPDF = True
+except ImportError:
+    try:
+        import fitz as pymupdf
+        HAS_PYMUPDF = True
+    except ImportError:
+        HAS_PYMUPDF = False
+
+HAS_PDF_BACKEND = HAS_PYMUPDF or HAS_PDFPLUMBER
+
 BULLET = '\uf0d8'
 
 PRICE_RE = re.compile(r'U\$S\s*([\d.,]+)\.=', re.IGNORECASE)
 PRICE_CONSULTAR_RE = re.compile(r'U\$S\s*consultar', re.IGNORECASE)
-MODEL_CAPS_RE = re.compile(r'^MODELO:\s*(.+)', re.IGNORECASE)
-MODEL_LOWER_RE = re.compile(r'^Modelo:\s*(.+)')
-PAGE_HEADER_RE = re.compile(r'^P[\s\S]{0,12}g[\s\S]{0,5}ina\s*\|\s*\d+', re.IGNORECASE)
+# "MODELO:" en cualquier caja; group(1) conserva la palabra tal cual para distinguir
+# el rotulo en mayusculas del "Modelo:" inline sin un segundo regex
+MODEL_RE = re.compile(r'^(MODELO):\s*(.+)', re.IGNORECASE)
 
 # Palabras que NO pueden iniciar un titulo de producto (conjunciones/preposiciones/continuaciones)
 CONTINUATION_STARTS = {
@@ -48,6 +69,128 @@ OPTIONAL_SECTION_RE = re.compile(
     re.IGNORECASE
 )
 
+# Patrones que se aplican linea por linea: compilados una vez
+# Encabezado "Pagina | N" (la a acentuada sale rota segun el extractor). Se quita del texto
+# de cada pagina antes de partirlo en lineas; los comodines no cruzan el salto de linea.
+PAGE_HEADER_LINE_RE = re.compile(
+    r'^[ \t]*P[^\n]{0,12}g[^\n]{0,5}ina[ \t]*\|[ \t]*\d+\n?', re.MULTILINE | re.IGNORECASE
+)
+# Todo lo que descarta una linea como titulo por su comienzo: vineta o rotulos conocidos,
+# en una sola alternancia (el encabezado de pagina ya se quito con PAGE_HEADER_LINE_RE)
+TITLE_REJECT_RE = re.compile(
+    r'^(?:\uf0d8|(?:MODELO|OPCIONAL|OPCIONALES|PRECIO|LOS PRECIOS|FORMA DE)\b)',
+    re.IGNORECASE
+)
+MODEL_PREFIX_RE = re.compile(r'^MODELO\b', re.IGNORECASE)
+OPTIONAL_INLINE_RE = re.compile(r'^OPCIONAL(?:ES)?:\s*', re.IGNORECASE)
+OPTIONAL_FOR_PREFIX_RE = re.compile(r'^OPCIONAL(?:ES)?\s*(?:PARA\s+\w+)?\s*:', re.IGNORECASE)
+OPTIONAL_FOR_TITLE_RE = re.compile(r'^OPCIONAL(?:ES)?\s+PARA\b', re.IGNORECASE)
+TRAILER_TITLE_RE = re.compile(r'^(ACOPLADOS?|CARGADOR)\b')
+NON_SPEC_TITLE_RE = re.compile(r'^(ACOPLADOS?|CARGADOR|SIN FINES)\b', re.IGNORECASE)
+TRAILING_DOTS_RE = re.compile(r'[\s.]+$')
+DOT_LEADER_RE = re.compile(r'(\s+\.){2,}.*$')
+MULTI_DOT_RE = re.compile(r'\.{2,}')
+NON_ALNUM_RE = re.compile(r'[^A-Z0-9]')
+CAPS_WORD_RE = re.compile(r'[A-ZÁÉÍÓÚ]{2,}')
+CONDITION_LABEL_RE = re.compile(r'^([a-e])\)\s+(.+)')
+DISCOUNT_PCT_RE = re.compile(r'-\s*(\d+)\s*%')
+DISCOUNT_SUFFIX_RE = re.compile(r'\s*[-–]\s*\d+\s*%.*$')
+
+
+# ---------------------------------------------------------------------------
+# Extraccion de texto
+# ---------------------------------------------------------------------------
+
+def _mupdf_page_text(page, y_tolerance: float = 3) -> str:
+    """
+    Arma el texto de la pagina como pdfplumber.extract_text(): palabras agrupadas
+    en lineas por altura (misma tolerancia) y ordenadas de izquierda a derecha,
+    para que titulo y precio en columnas distintas queden en la misma linea.
+    """
+    lines: list[list] = []
+    line_top = None
+    for word in sorted(page.get_text("words"), key=lambda w: (w[1], w[0])):
+        if line_top is None or word[1] - line_top > y_tolerance:
+            lines.append([])
+            line_top = word[1]
+        lines[-1].append(word)
+    return '\n'.join(
+        ' '.join(w[4] for w in sorted(line, key=lambda w: w[0])) for line in lines
+    )
+
+
+def _pdfplumber_page_text(page) -> str:
+    # Solo hacen falta las lineas en orden: extract_text_simple agrupa los caracteres por
+    # altura sin el armado de palabras de extract_text() y da el mismo texto para la lista
+    return page.extract_text_simple(x_tolerance=3, y_tolerance=3) or ''
+
+
+def _is_conditions_page(raw: str) -> bool:
+    # Sobre el texto crudo (sin armar lineas); pdfplumber no siempre trae los espacios
+    return 'CONDICIONESCOMERCIALES' in ''.join(raw.split())
+
+
+def _mupdf_text(page, conditions: Optional[bool]) -> str:
+    # El texto crudo de PyMuPDF cuesta casi lo mismo que armar las lineas: solo vale
+    # la pena para descartar paginas cuando se buscan las condiciones
+    if conditions and not _is_conditions_page(page.get_text()):
+        return ''
+    return _mupdf_page_text(page)
+
+
+def _pdfplumber_text(page, conditions: Optional[bool]) -> str:
+    if conditions is not None and _is_conditions_page(''.join(c['text'] for c in page.chars)) != conditions:
+        return ''
+    return _pdfplumber_page_text(page)
+
+
+# Con pdfplumber (Python puro), desde esta cantidad de paginas la extraccion se reparte
+# entre procesos; con menos (la lista de precios tiene ~16) levantar workers cuesta mas
+# que extraer en serie. PyMuPDF extrae en serie siempre: no llega a amortizarlos.
+PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARSE_PARALLEL_PAGES', 64))
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int,
+                        conditions: Optional[bool] = None) -> list[str]:
+    """Texto de las paginas [start, stop); abre su propia copia del documento."""
+    if HAS_PYMUPDF:
+        with pymupdf.open(pdf_path) as doc:
+            return [_mupdf_text(doc[i], conditions) for i in range(start, min(stop, doc.page_count))]
+    with pdfplumber.open(pdf_path) as pdf:
+        return [_pdfplumber_text(page, conditions) for page in pdf.pages[start:stop]]
+
+
+def _extract_parallel(pdf_path: str, page_count: int, conditions: Optional[bool] = None) -> list[str]:
+    # Un bloque contiguo de paginas por worker: cada uno abre el PDF una sola vez.
+    # map() conserva el orden, asi que los indices de producto siguen siendo correlativos.
+    workers = min(os.cpu_count() or 1, page_count)
+    step = -(-page_count // workers)
+    starts = range(0, page_count, step)
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        chunks = pool.map(
+            _extract_page_range, repeat(pdf_path), starts, [i + step for i in starts], repeat(conditions)
+        )
+        return [text for chunk in chunks for text in chunk]
+
+
+def extract_page_texts(pdf_path: str, conditions: Optional[bool] = None) -> list[str]:
+    """
+    Texto de cada pagina del PDF, con PyMuPDF si esta disponible o pdfplumber.
+    Los parsers aceptan esta lista en lugar de la ruta para no reabrir el documento.
+    `conditions`: True arma solo las paginas de CONDICIONES COMERCIALES, False todas
+    menos esas; las demas quedan en '' (se conservan los indices de pagina).
+    """
+    if HAS_PYMUPDF:
+        with pymupdf.open(pdf_path) as doc:
+            return [_mupdf_text(page, conditions) for page in doc]
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+        if page_count < PARALLEL_MIN_PAGES:
+            return [_pdfplumber_text(page, conditions) for page in pdf.pages]
+    return _extract_parallel(pdf_path, page_count, conditions)
+
 
 # ---------------------------------------------------------------------------
 # Utilidades
@@ -64,6 +207,7 @@ def _parse_price(text: str) -> Optional[float]:
         return None
 
 
+@lru_cache(maxsize=1024)
 def _extract_variant_name(price_line: str) -> Optional[str]:
     """
     Extrae el nombre de variante de una línea de precio como:
@@ -73,37 +217,32 @@ def _extract_variant_name(price_line: str) -> Optional[str]:
     """
     without_price = PRICE_RE.sub('', price_line).strip()
     # Quitar leader de puntos al final
-    without_dots = re.sub(r'[\s.]+$', '', without_price).strip()
+    without_dots = TRAILING_DOTS_RE.sub('', without_price).strip()
     if not without_dots or len(without_dots) < 4:
         return None
-    if re.match(r'^MODELO\b', without_dots, re.IGNORECASE):
+    if MODEL_PREFIX_RE.match(without_dots):
         return None
     return without_dots
 
 
+# Titulos y lineas de precio se repiten entre paginas e importaciones
+@lru_cache(maxsize=4096)
 def _is_product_title(line: str) -> bool:
     """True si la linea parece un titulo de producto (mayusculas, sustancial)."""
     line = line.strip()
     if not line or len(line) < 8:
         return False
-    if PAGE_HEADER_RE.match(line):
-        return False
-    if re.match(r'^(MODELO|OPCIONAL|OPCIONALES|PRECIO|LOS PRECIOS|FORMA DE)\b', line, re.IGNORECASE):
-        return False
-    if PRICE_RE.search(line):
-        return False
-    if line.startswith(BULLET):
+    if TITLE_REJECT_RE.match(line) or PRICE_RE.search(line):
         return False
     # Excluir lineas de continuacion
-    first_word = line.split()[0].rstrip('.,;:') if line.split() else ''
+    first_word = line.split(None, 1)[0].rstrip('.,;:')
     if first_word.upper() in CONTINUATION_STARTS:
         return False
-    # Debe ser mayoritariamente MAYUSCULAS
-    alpha = [c for c in line if c.isalpha()]
-    if not alpha or len(alpha) < 5:
+    # Debe ser mayoritariamente MAYUSCULAS (conteo con map en C, sin listas intermedias)
+    alpha_count = sum(map(str.isalpha, line))
+    if alpha_count < 5:
         return False
-    upper_ratio = sum(1 for c in alpha if c.isupper()) / len(alpha)
-    return upper_ratio >= 0.75
+    return sum(map(str.isupper, line)) / alpha_count >= 0.75
 
 
 def _is_optional_section(line: str) -> bool:
@@ -111,6 +250,71 @@ def _is_optional_section(line: str) -> bool:
     return bool(OPTIONAL_SECTION_RE.match(line.strip()))
 
 
+@dataclass(slots=True)
+class OptionalRecord:
+    name: str
+    price: Optional[float]
+
+
+@dataclass(slots=True)
+class ProductRecord:
+    """Producto mientras se parsea; hacia afuera se entrega como dict."""
+    code: str
+    product_title: str
+    model_name: str
+    name: str
+    category: str
+    price: Optional[float]
+    price_currency: str = 'USD'
+    specs: list[str] = field(default_factory=list)
+    optionals: list[OptionalRecord] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        # A mano y sin copiar las listas: dataclasses.asdict hace deepcopy de todo
+        return {
+            'code': self.code,
+            'product_title': self.product_title,
+            'model_name': self.model_name,
+            'name': self.name,
+            'category': self.category,
+            'price': self.price,
+            'price_currency': self.price_currency,
+            'specs': self.specs,
+            'optionals': [{'name': o.name, 'price': o.price} for o in self.optionals],
+        }
+
+
+class LineFlags(NamedTuple):
+    is_title: bool
+    is_bullet: bool
+    has_price: bool          # "U$S 1.234.="
+    has_any_price: bool      # precio o "U$S consultar"
+    optional_section: bool   # "OPCIONALES:" como linea de seccion
+    optional_inline: bool    # "OPCIONAL: item ..." en la misma linea
+    model_caps: Optional[re.Match]
+    model_lower: Optional[re.Match]
+
+
+@lru_cache(maxsize=4096)
+def _line_flags(line: str) -> LineFlags:
+    """
+    Clasifica la linea una sola vez: el split de bloques, segmentos y opcionales
+    vuelve a preguntar por la misma linea varias veces.
+    """
+    has_price = bool(PRICE_RE.search(line))
+    model = MODEL_RE.match(line)
+    return LineFlags(
+        is_title=_is_product_title(line),
+        is_bullet=line.startswith(BULLET),
+        has_price=has_price,
+        has_any_price=has_price or bool(PRICE_CONSULTAR_RE.search(line)),
+        optional_section=_is_optional_section(line),
+        optional_inline=bool(OPTIONAL_INLINE_RE.match(line)),
+        model_caps=model,
+        model_lower=model if model and model.group(1) == 'Modelo' else None,
+    )
+
+
 def _clean_spec(line: str) -> str:
     line = line.strip()
     if line.startswith(BULLET):
@@ -118,46 +322,71 @@ def _clean_spec(line: str) -> str:
     return line
 
 
+# Palabra clave -> categoria, en orden de prioridad: gana la primera presente en el titulo
+CATEGORY_KEYWORDS = {
+    'TOLVA': 'Tolvas',
+    'TRIVUELCO': 'Volcadores Trivuelco',
+    'VOLCADOR': 'Volcadores',
+    'PLAYO': 'Acoplados Playos',
+    'BARANDAS': 'Acoplados Playos',  # salvo que sea un volcador con barandas
+    'BALANCIN': 'Trailers',
+    'TRAILER': 'Trailers',
+    'VAQUERO': 'Vaqueros',
+    'ROLLO': 'Transportadores de Rollos',
+    'SIN FIN': 'Sinfines',
+    'NIVELADORA': 'Hojas Niveladoras',
+    'HOJA': 'Hojas Niveladoras',
+    'GRUA': 'Gruas',
+    'PALA': 'Palas',
+    'ELEVADOR': 'Elevadores',
+}
+DEFAULT_CATEGORY = 'Maquinaria Agricola'
+# Una sola pasada sobre el titulo encuentra todas las palabras clave (las mas largas
+# primero, para que VOLCADOR no quede tapado por VOLCAD)
+CATEGORY_RE = re.compile('|'.join(
+    re.escape(kw) for kw in sorted([*CATEGORY_KEYWORDS, 'VOLCAD'], key=len, reverse=True)
+))
+
+
+@lru_cache(maxsize=256)
 def _extract_category(title: str) -> str:
-    t = title.upper()
-    if 'TOLVA' in t:
-        return 'Tolvas'
-    if 'TRIVUELCO' in t:
-        return 'Volcadores Trivuelco'
-    if 'VOLCADOR' in t:
-        return 'Volcadores'
-    if 'PLAYO' in t or ('BARANDAS' in t and 'VOLCAD' not in t):
-        return 'Acoplados Playos'
-    if 'BALANCIN' in t or 'TRAILER' in t:
-        return 'Trailers'
-    if 'VAQUERO' in t:
-        return 'Vaqueros'
-    if 'ROLLO' in t:
-        return 'Transportadores de Rollos'
-    if 'SIN FIN' in t:
-        return 'Sinfines'
-    if 'NIVELADORA' in t or 'HOJA' in t:
-        return 'Hojas Niveladoras'
-    if 'GRUA' in t:
-        return 'Gruas'
-    if 'PALA' in t:
-        return 'Palas'
-    if 'ELEVADOR' in t:
-        return 'Elevadores'
-    return 'Maquinaria Agricola'
+    found = set(CATEGORY_RE.findall(title.upper()))
+    if not found:
+        return DEFAULT_CATEGORY
+    if 'VOLCAD' in found or 'VOLCADOR' in found:
+        found.discard('BARANDAS')
+    for keyword, category in CATEGORY_KEYWORDS.items():
+        if keyword in found:
+            return category
+    return DEFAULT_CATEGORY
+
+
+@lru_cache(maxsize=256)
+def _title_acronym(product_title: str) -> str:
+    # Todas las variantes y modelos de un bloque comparten el titulo
+    return ''.join(w[0] for w in CAPS_WORD_RE.findall(product_title.upper()))[:6]
 
 
 def _generate_code(product_title: str, model_name: str, idx: int) -> str:
-    model_clean = re.sub(r'[^A-Z0-9]', '', model_name.upper())
-    if model_clean and len(model_clean) >= 2:
+    model_clean = NON_ALNUM_RE.sub('', model_name.upper())
+    if len(model_clean) >= 2:
         return model_clean[:14]
-    words = re.findall(r'[A-ZÁÉÍÓÚ]{2,}', product_title.upper())
-    acronym = ''.join(w[0] for w in words)[:6]
+    acronym = _title_acronym(product_title)
     return f"{acronym}{idx:02d}" if acronym else f"PROD{idx:03d}"
 
 
-def _parse_optionals(opt_lines: list[str]) -> list[dict]:
-    """Parsea lineas de opcionales en [{name, price}]."""
+def _clean_name(text: str) -> str:
+    """Nombre de un opcional sin su precio ni los leaders de puntos."""
+    # Hay a lo sumo un precio por item; los strip intermedios no cambian el resultado
+    return MULTI_DOT_RE.sub('', PRICE_RE.sub('', text, count=1)).strip().rstrip('.')
+
+
+def _parse_optionals(opt_lines: list[str]) -> list[OptionalRecord]:
+    """Parsea lineas de opcionales en [OptionalRecord(name, price)]."""
+    # La mayoria de los segmentos no trae opcionales. No se corta cuando ninguna linea
+    # tiene precio: los opcionales "U$S consultar" o sin precio salen con price=None.
+    if not opt_lines:
+        return []
     optionals = []
     buffer: list[str] = []
 
@@ -166,18 +395,18 @@ def _parse_optionals(opt_lines: list[str]) -> list[dict]:
             return
         text = ' '.join(buffer)
         price = _parse_price(text)
-        name = PRICE_RE.sub('', text).strip()
-        name = re.sub(r'\.{2,}', '', name).strip().rstrip('.')
+        name = _clean_name(text)
         if name and len(name) > 3:
-            optionals.append({'name': name, 'price': price})
+            optionals.append(OptionalRecord(name, price))
         buffer.clear()
 
     for line in opt_lines:
         line = line.strip()
         if not line:
             continue
-        has_price = bool(PRICE_RE.search(line))
-        is_bullet = line.startswith(BULLET)
+        flags = _line_flags(line)
+        has_price = flags.has_price
+        is_bullet = flags.is_bullet
         if is_bullet:
             flush()
             buffer.append(_clean_spec(line))
@@ -188,10 +417,9 @@ def _parse_optionals(opt_lines: list[str]) -> list[dict]:
             flush()
         elif has_price:
             price = _parse_price(line)
-            name = PRICE_RE.sub('', line).strip()
-            name = re.sub(r'\.{2,}', '', name).strip().rstrip('.')
+            name = _clean_name(line)
             if name and len(name) > 3:
-                optionals.append({'name': name, 'price': price})
+                optionals.append(OptionalRecord(name, price))
         else:
             buffer.append(line)
 
@@ -210,19 +438,20 @@ def _split_specs_opts(lines: list[str]) -> tuple[list[str], list[str], list[str]
     in_optional = False
 
     for line in lines:
-        if _is_optional_section(line):
+        flags = _line_flags(line)
+        if flags.optional_section:
             in_optional = True
             continue
         # "OPCIONAL: contenido..." → inicio de sección + primer item en misma línea
-        if re.match(r'^OPCIONAL(?:ES)?:', line, re.IGNORECASE) and not in_optional:
+        if flags.optional_inline and not in_optional:
             in_optional = True
-            after_colon = re.sub(r'^OPCIONAL(?:ES)?:\s*', '', line, flags=re.IGNORECASE).strip()
+            after_colon = OPTIONAL_INLINE_RE.sub('', line).strip()
             if after_colon:
                 opt_lines.append(after_colon)
             continue
         if in_optional:
             opt_lines.append(line)
-        elif PRICE_RE.search(line) or PRICE_CONSULTAR_RE.search(line):
+        elif flags.has_any_price:
             price_lines.append(line)
         else:
             spec_lines.append(line)
@@ -234,7 +463,7 @@ def _split_specs_opts(lines: list[str]) -> tuple[list[str], list[str], list[str]
 # Parseo de bloque de producto
 # ---------------------------------------------------------------------------
 
-def _parse_product_block(title: str, body_lines: list[str], idx: int) -> list[dict]:
+def _parse_product_block(title: str, body_lines: list[str], idx: int) -> list[ProductRecord]:
     """
     Convierte un bloque (titulo + cuerpo) en 1 o mas productos.
     """
@@ -245,12 +474,13 @@ def _parse_product_block(title: str, body_lines: list[str], idx: int) -> list[di
     current_lines: list[str] = []
 
     for line in body_lines:
-        m = MODEL_CAPS_RE.match(line)
+        flags = _line_flags(line)
+        m = flags.model_caps
         if m:
-            model_str = PRICE_RE.sub('', m.group(1)).strip()
+            model_str = PRICE_RE.sub('', m.group(2)).strip()
             # Remover guiones de lider de puntos "G.H.G. 6 . . . ." → "G.H.G. 6"
-            model_str = re.sub(r'(\s+\.){2,}.*$', '', model_str).strip().rstrip('-–.').strip()
-            has_price = bool(PRICE_RE.search(line))
+            model_str = DOT_LEADER_RE.sub('', model_str).strip().rstrip('-–.').strip()
+            has_price = flags.has_price
             # Si mismo modelo y tiene precio → es la linea de precio del segmento actual
             if model_str == current_model and has_price:
                 current_lines.append(line)
@@ -258,7 +488,7 @@ def _parse_product_block(title: str, body_lines: list[str], idx: int) -> list[di
                 if current_model is not None:
                     segments_caps.append((current_model, current_lines))
                 else:
-                    preamble = current_lines[:]
+                    preamble = current_lines
                 current_model = model_str
                 current_lines = []
                 if has_price:
@@ -282,21 +512,22 @@ def _parse_product_block(title: str, body_lines: list[str], idx: int) -> list[di
     in_optional = False
 
     for line in preamble if not body_lines else body_lines:
-        if _is_optional_section(line):
+        flags = _line_flags(line)
+        if flags.optional_section:
             in_optional = True
             # Si "OPCIONAL: contenido ..." la misma linea puede tener un item
-            after_colon = re.sub(r'^OPCIONAL(?:ES)?\s*(?:PARA\s+\w+)?\s*:', '', line, flags=re.IGNORECASE).strip()
+            after_colon = OPTIONAL_FOR_PREFIX_RE.sub('', line).strip()
             if after_colon and len(after_colon) > 3:
                 cur_inline_optionals.append(after_colon)
             continue
         if in_optional:
             cur_inline_optionals.append(line)
             continue
-        mi = MODEL_LOWER_RE.match(line)
+        mi = flags.model_lower
         if mi:
-            raw_model = mi.group(1).strip()
+            raw_model = mi.group(2).strip()
             new_model = raw_model.split(' - ')[0].split(' – ')[0].strip()
-            has_price = PRICE_RE.search(line)
+            has_price = flags.has_price
             # Si el modelo es el mismo que el actual y tiene precio → es la linea de precio, no nuevo modelo
             if new_model == cur_model_inline and has_price:
                 cur_inline_price_lines.append(line)
@@ -310,13 +541,13 @@ def _parse_product_block(title: str, body_lines: list[str], idx: int) -> list[di
                 cur_model_inline = new_model
                 if has_price:
                     cur_inline_price_lines.append(line)
-        elif re.match(r'^OPCIONAL(?:ES)?:', line, re.IGNORECASE):
+        elif flags.optional_inline:
             # "OPCIONAL: item ... U$S X.=" → inicio de sección + primer item en la misma línea
             in_optional = True
-            after_colon = re.sub(r'^OPCIONAL(?:ES)?:\s*', '', line, flags=re.IGNORECASE).strip()
+            after_colon = OPTIONAL_INLINE_RE.sub('', line).strip()
             if after_colon and len(after_colon) > 3:
                 cur_inline_optionals.append(after_colon)
-        elif PRICE_RE.search(line) or PRICE_CONSULTAR_RE.search(line):
+        elif flags.has_any_price:
             cur_inline_price_lines.append(line)
         elif cur_model_inline is not None:
             cur_inline_specs.append(line)
@@ -336,19 +567,18 @@ def _parse_product_block(title: str, body_lines: list[str], idx: int) -> list[di
     fallback_specs, fallback_prices, fallback_opts = _split_specs_opts(body_lines)
     price = _parse_price(' '.join(fallback_prices)) if fallback_prices else None
     specs_clean = [_clean_spec(l) for l in fallback_specs
-                   if l.strip() and l != 'PRECIO' and not re.match(r'^(ACOPLADOS?|CARGADOR)\b', l)]
+                   if l.strip() and l != 'PRECIO' and not TRAILER_TITLE_RE.match(l)]
 
-    return [{
-        'code': _generate_code(title, '', idx),
-        'product_title': title,
-        'model_name': '',
-        'name': title,
-        'category': _extract_category(title),
-        'price': price,
-        'price_currency': 'USD',
-        'specs': specs_clean,
-        'optionals': _parse_optionals(fallback_opts),
-    }]
+    return [ProductRecord(
+        code=_generate_code(title, '', idx),
+        product_title=title,
+        model_name='',
+        name=title,
+        category=_extract_category(title),
+        price=price,
+        specs=specs_clean,
+        optionals=_parse_optionals(fallback_opts),
+    )]
 
 
 def _build_products(
@@ -356,15 +586,17 @@ def _build_products(
     preamble: list[str],
     segments: list[tuple],
     start_idx: int,
-) -> list[dict]:
+) -> list[ProductRecord]:
     """Construye lista de productos desde segmentos."""
-    common_specs = [_clean_spec(l) for l in preamble
-                    if not PRICE_RE.search(l)
-                    and l.strip() and l != 'PRECIO'
-                    and not re.match(r'^(ACOPLADOS?|CARGADOR|SIN FINES)\b', l, re.IGNORECASE)]
+    # Filtrado una vez por bloque; cada segmento solo agrega sus propias specs
+    common_specs = [s for s in (_clean_spec(l) for l in preamble
+                                if not _line_flags(l).has_price
+                                and l.strip() and l != 'PRECIO'
+                                and not NON_SPEC_TITLE_RE.match(l)) if s]
 
     products = []
     product_counter = 0  # índice propio para códigos únicos
+    category = _extract_category(title)  # igual para todos los segmentos del bloque
 
     for segment in segments:
         if len(segment) == 4:
@@ -376,46 +608,45 @@ def _build_products(
             model, seg_lines = segment
             seg_specs, price_lines, opt_lines = _split_specs_opts(seg_lines)
 
-        all_specs = common_specs + [_clean_spec(l) for l in seg_specs
-                                     if l.strip() and l != 'PRECIO']
+        all_specs = common_specs + [s for s in (_clean_spec(l) for l in seg_specs
+                                                if l.strip() and l != 'PRECIO') if s]
+        optionals = _parse_optionals(opt_lines)
 
         # Detectar variantes de precio con prefijo descriptivo
         # ej: "VUELCO MANUAL... U$S 6.087.=" y "VUELCO HIDRAULICO... U$S 6.814.="
-        valid_prices = [(pl, _parse_price(pl)) for pl in price_lines if _parse_price(pl) is not None]
-        named_variants = [(pl, pv, _extract_variant_name(pl)) for pl, pv in valid_prices]
-        named_variants = [(pl, pv, vn) for pl, pv, vn in named_variants if vn]
+        valid_prices = [(pl, pv) for pl in price_lines if (pv := _parse_price(pl)) is not None]
+        named_variants = [(pl, pv, vn) for pl, pv in valid_prices if (vn := _extract_variant_name(pl))]
 
         if len(named_variants) > 1:
             # Múltiples variantes → un producto por variante
             for pl, pv, vn in named_variants:
                 var_model = f"{model} – {vn}" if model else vn
-                products.append({
-                    'code': _generate_code(title, var_model, start_idx + product_counter),
-                    'product_title': title,
-                    'model_name': var_model,
-                    'name': f"{title} – {var_model}",
-                    'category': _extract_category(title),
-                    'price': pv,
-                    'price_currency': 'USD',
-                    'specs': [s for s in all_specs if s],
-                    'optionals': _parse_optionals(opt_lines),
-                })
+                products.append(ProductRecord(
+                    code=_generate_code(title, var_model, start_idx + product_counter),
+                    product_title=title,
+                    model_name=var_model,
+                    name=f"{title} – {var_model}",
+                    category=category,
+                    price=pv,
+                    # Listas propias: un bloque resumen puede extender los opcionales del ultimo
+                    specs=list(all_specs),
+                    optionals=list(optionals),
+                ))
                 product_counter += 1
         else:
             # Precio único (comportamiento normal)
             price = valid_prices[0][1] if valid_prices else None
             name = f"{title} – {model}" if model else title
-            products.append({
-                'code': _generate_code(title, model, start_idx + product_counter),
-                'product_title': title,
-                'model_name': model,
-                'name': name,
-                'category': _extract_category(title),
-                'price': price,
-                'price_currency': 'USD',
-                'specs': [s for s in all_specs if s],
-                'optionals': _parse_optionals(opt_lines),
-            })
+            products.append(ProductRecord(
+                code=_generate_code(title, model, start_idx + product_counter),
+                product_title=title,
+                model_name=model,
+                name=name,
+                category=category,
+                price=price,
+                specs=all_specs,
+                optionals=optionals,
+            ))
             product_counter += 1
 
     return products
@@ -425,7 +656,7 @@ def _build_products(
 # Parseo por pagina
 # ---------------------------------------------------------------------------
 
-def _parse_page(text: str, start_idx: int) -> list[dict]:
+def _parse_page(text: str, start_idx: int) -> list[ProductRecord]:
     """Parsea el texto de una pagina en lista de productos."""
     lines = [l.strip() for l in text.split('\n') if l.strip()]
 
@@ -436,7 +667,7 @@ def _parse_page(text: str, start_idx: int) -> list[dict]:
     current_body: list[str] = []
 
     for line in lines:
-        if _is_product_title(line) and line not in ('PRECIO',):
+        if _line_flags(line).is_title and line not in ('PRECIO',):
             if current_title:
                 is_summary = (current_body and current_body[0] == 'PRECIO')
                 blocks.append((current_title, current_body, is_summary))
@@ -455,7 +686,7 @@ def _parse_page(text: str, start_idx: int) -> list[dict]:
 
     for title, body, is_summary in blocks:
         # Ignorar seccion global de opcionales
-        if re.match(r'^OPCIONAL(?:ES)?\s+PARA\b', title, re.IGNORECASE):
+        if OPTIONAL_FOR_TITLE_RE.match(title):
             continue
 
         if is_summary:
@@ -464,12 +695,13 @@ def _parse_page(text: str, start_idx: int) -> list[dict]:
             opt_lines: list[str] = []
             in_opt = False
             for line in body:
-                if _is_optional_section(line):
+                flags = _line_flags(line)
+                if flags.optional_section:
                     in_opt = True
                     continue
                 if in_opt:
                     opt_lines.append(line)
-                elif PRICE_RE.search(line):
+                elif flags.has_price:
                     if price is None:
                         price = _parse_price(line)
                 # else: ignore summary header lines
@@ -477,10 +709,10 @@ def _parse_page(text: str, start_idx: int) -> list[dict]:
             # Asignar al ultimo producto
             if products:
                 last = products[-1]
-                if last['price'] is None and price is not None:
-                    last['price'] = price
+                if last.price is None and price is not None:
+                    last.price = price
                 if opt_lines:
-                    last['optionals'].extend(_parse_optionals(opt_lines))
+                    last.optionals.extend(_parse_optionals(opt_lines))
             # else: crear un producto placeholder (caso raro)
         else:
             block_products = _parse_product_block(title, body, idx)
@@ -494,98 +726,124 @@ def _parse_page(text: str, start_idx: int) -> list[dict]:
 # Funcion principal
 # ---------------------------------------------------------------------------
 
-def parse_price_list_pdf(pdf_path: str) -> list[dict]:
+def _as_page_texts(source, conditions: Optional[bool] = None) -> list[str]:
+    return source if isinstance(source, list) else extract_page_texts(source, conditions)
+
+
+def parse_price_list_pdf(source) -> list[dict]:
     """
     Parsea el PDF de lista de precios y retorna lista de productos para preview admin.
+    `source`: ruta del PDF o los textos ya extraidos con extract_page_texts().
 
     Cada producto:
         code, product_title, model_name, name, category,
         price, price_currency, specs (list[str]), optionals (list[{name, price}])
     """
-    if not HAS_PDFPLUMBER:
-        raise RuntimeError("pdfplumber no instalado. Ejecutar: pip install pdfplumber")
+    return list(iter_price_list_pdf(source))
 
-    products: list[dict] = []
-    product_idx = 1
 
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_num, page in enumerate(pdf.pages):
-            if page_num == 0:
-                continue  # portada
+def iter_price_list_pdf(source) -> Iterator[dict]:
+    """
+    Igual que parse_price_list_pdf() pero entrega los productos pagina a pagina,
+    sin armar la lista completa.
+    """
+    if not HAS_PDF_BACKEND:
+        raise RuntimeError("Ni pymupdf ni pdfplumber instalados. Ejecutar: pip install pymupdf")
+    return _iter_products(_as_page_texts(source, conditions=False))
 
-            text = page.extract_text() or ''
 
-            if 'CONDICIONES COMERCIALES' in text:
-                continue  # pagina de condiciones
+def _products_from_texts(page_texts: list[str]) -> list[dict]:
+    return list(_iter_products(page_texts))
 
-            # Quitar encabezado de pagina
-            text = re.sub(r'^P[\s\S]{0,12}g[\s\S]{0,5}ina\s*\|\s*\d+\n?', '', text, flags=re.MULTILINE)
 
-            page_products = _parse_page(text, product_idx)
-            products.extend(page_products)
-            product_idx += len(page_products)
+def _iter_products(page_texts: list[str]) -> Iterator[dict]:
+    # Los bloques resumen solo tocan productos de su misma pagina: se puede entregar
+    # cada pagina apenas se parsea. Los codigos repetidos se numeran al pasar.
+    seen: defaultdict[str, int] = defaultdict(int)
+    product_idx = 1
 
-    # Garantizar codigos unicos
-    seen: dict[str, int] = {}
-    for p in products:
-        code = p['code']
-        if code in seen:
-            seen[code] += 1
-            p['code'] = f"{code}-{seen[code]}"
-        else:
-            seen[code] = 0
+    for page_num, text in enumerate(page_texts):
+        if page_num == 0:
+            continue  # portada
 
-    return products
+        if 'CONDICIONES COMERCIALES' in text:
+            continue  # pagina de condiciones
+
+        # Quitar encabezado de pagina
+        text = PAGE_HEADER_LINE_RE.sub('', text)
+
+        page_products = _parse_page(text, product_idx)
+        product_idx += len(page_products)
+
+        for p in page_products:
+            code = p.code
+            n = seen[code]
+            seen[code] = n + 1
+            if n:
+                p.code = f"{code}-{n}"
+            yield p.as_dict()
 
 
 # ---------------------------------------------------------------------------
 # Condiciones de pago
 # ---------------------------------------------------------------------------
 
-def parse_payment_conditions(pdf_path: str) -> list[dict]:
+def parse_payment_conditions(source) -> list[dict]:
     """
-    Extrae condiciones de pago del PDF.
+    Extrae condiciones de pago del PDF (ruta o textos de extract_page_texts()).
     Retorna [{name, discount_percent, description, sort_order}].
     """
-    if not HAS_PDFPLUMBER:
+    if not HAS_PDF_BACKEND:
         return []
+    return _conditions_from_texts(_as_page_texts(source, conditions=True))
+
 
+def _conditions_from_texts(page_texts: list[str]) -> list[dict]:
     conditions: list[dict] = []
-    with pdfplumber.open(pdf_path) as pdf:
-        for page in pdf.pages:
-            text = page.extract_text() or ''
-            if 'CONDICIONES COMERCIALES' not in text:
-                continue
-
-            label: Optional[str] = None
-            buffer: list[str] = []
-            sort_order = 0
-
-            for line in text.split('\n'):
-                line = line.strip()
-                m = re.match(r'^([a-e])\)\s+(.+)', line)
-                if m:
-                    if label and buffer:
-                        _append_condition(conditions, buffer, sort_order)
-                        sort_order += 1
-                        buffer = []
-                    label = m.group(1)
-                    buffer.append(m.group(2))
-                elif label and line:
-                    buffer.append(line)
-
-            if label and buffer:
-                _append_condition(conditions, buffer, sort_order)
+    for text in page_texts:
+        if 'CONDICIONES COMERCIALES' not in text:
+            continue
+
+        label: Optional[str] = None
+        buffer: list[str] = []
+        sort_order = 0
+
+        for line in text.split('\n'):
+            line = line.strip()
+            m = CONDITION_LABEL_RE.match(line)
+            if m:
+                if label and buffer:
+                    _append_condition(conditions, buffer, sort_order)
+                    sort_order += 1
+                    buffer = []
+                label = m.group(1)
+                buffer.append(m.group(2))
+            elif label and line:
+                buffer.append(line)
+
+        if label and buffer:
+            _append_condition(conditions, buffer, sort_order)
 
     return conditions
 
 
+def parse_price_list(pdf_path: str) -> tuple[list[dict], list[dict]]:
+    """
+    Productos y condiciones de pago del PDF, extrayendo el texto una sola vez.
+    Equivale a parse_price_list_pdf() + parse_payment_conditions().
+    """
+    if not HAS_PDF_BACKEND:
+        raise RuntimeError("Ni pymupdf ni pdfplumber instalados. Ejecutar: pip install pymupdf")
+    page_texts = extract_page_texts(pdf_path)
+    return _products_from_texts(page_texts), _conditions_from_texts(page_texts)
+
+
 def _append_condition(conditions: list, lines: list[str], sort_order: int):
     text = ' '.join(lines).strip()
-    pct_m = re.search(r'-\s*(\d+)\s*%', text)
+    pct_m = DISCOUNT_PCT_RE.search(text)
     discount = float(pct_m.group(1)) if pct_m else 0.0
-    name_part = text.split(':')[0].strip() if ':' in text else text
-    name_part = re.sub(r'\s*[-–]\s*\d+\s*%.*$', '', name_part).strip()
+    name_part = text.partition(':')[0].strip()
+    name_part = DISCOUNT_SUFFIX_RE.sub('', name_part).strip()
     conditions.append({
         'name': name_part,
         'discount_percent': discount,
@@ -4,31 +4,27 @@ Script para ejecutar migraciones de Alembic
 """
 
 import os
-import subprocess
 import sys
 
+# API de Alembic en el mismo proceso: sin arrancar un interprete nuevo por comando
+# ni volver a importar SQLAlchemy y los modelos
+try:
+    from alembic import command
+    from alembic.config import Config
+except ImportError:
+    print("❌ Error: Alembic no está instalado (pip install -r requirements.txt)")
+    sys.exit(1)
+
+
+def _alembic_config():
+    return Config("alembic.ini")
+
 def run_migration():
     """Ejecuta las migraciones de Alembic"""
     try:
-        # Verificar si alembic está instalado
-        result = subprocess.run([sys.executable, "-m", "alembic", "--version"], 
-                              capture_output=True, text=True)
-        if result.returncode != 0:
-            print("Error: Alembic no está instalado. Instalando...")
-            subprocess.run([sys.executable, "-m", "pip", "install", "alembic"], check=True)
-        
-        # Ejecutar migraciones
         print("Ejecutando migraciones...")
-        result = subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], 
-                              capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            print("✅ Migraciones ejecutadas exitosamente")
-            print(result.stdout)
-        else:
-            print("❌ Error ejecutando migraciones:")
-            print(result.stderr)
-            return False
+        command.upgrade(_alembic_config(), "head")
+        print("✅ Migraciones ejecutadas exitosamente")
             
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -42,8 +38,7 @@ def create_initial_migration():
         # Verificar si ya existe la migración inicial
         if not os.path.exists("alembic/versions/0001_add_options_tables.py"):
             print("Creando migración inicial...")
-            subprocess.run([sys.executable, "-m", "alembic", "revision", "--autogenerate", "-m", "Add options tables"], 
-                          check=True)
+            command.revision(_alembic_config(), message="Add options tables", autogenerate=True)
             print("✅ Migración inicial creada")
         else:
             print("✅ Migración inicial ya existe")
@@ -1,31 +1,14 @@
 import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from main import app, get_db, Base, Machine, Quotation, Option
+from sqlalchemy import event
+from sqlalchemy.orm import raiseload
+from main import Machine, MachineSpec, Quotation, Option, create_access_token
+from main import _invalidate_cache, _response_caches
 import tempfile
 import os
 import json
 import jwt
 from datetime import datetime, timedelta
 
-# Create test database
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test_admin.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-Base.metadata.create_all(bind=engine)
-
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
-
-app.dependency_overrides[get_db] = override_get_db
-
-client = TestClient(app)
 
 # Test data
 test_admin_credentials = {
@@ -33,63 +16,78 @@ test_admin_credentials = {
     "password": "ar2810AR"
 }
 
-@pytest.fixture
-def setup_test_data():
-    db = TestingSessionLocal()
-    # Clear existing data
-    db.query(Machine).delete()
-    db.query(Quotation).delete()
-    db.query(Option).delete()
-    
-    # Add test machine
-    test_machine = Machine(
-        code="TEST001",
-        name="Test Machine",
-        price=15000.0,
-        category="Test Category",
-        description="Test machine description",
-        active=True
-    )
-    db.add(test_machine)
-    
-    # Add test options
-    test_option1 = Option(
-        name="Test Option 1",
-        price=1000.0,
-        description="Test option description 1",
-        active=True
-    )
-    test_option2 = Option(
-        name="Test Option 2",
-        price=2000.0,
-        description="Test option description 2",
-        active=True
-    )
-    db.add(test_option1)
-    db.add(test_option2)
-    db.commit()
-    
-    yield {
-        "machine": test_machine,
-        "option1": test_option1,
-        "option2": test_option2
-    }
-    
-    # Cleanup
-    db.query(Machine).delete()
-    db.query(Quotation).delete()
-    db.query(Option).delete()
+# Token de admin firmado una sola vez (vale 15 minutos, mas que toda la corrida); el
+# login por HTTP se prueba aparte en test_admin_login_success
+ADMIN_HEADERS = {"Authorization": "Bearer " + create_access_token(
+    data={"sub": test_admin_credentials["username"], "role": "admin"},
+    expires_delta=timedelta(minutes=15),
+)}
+
+@pytest.fixture(scope="module")
+def _seeded_db(session_factory, clear_tables):
+    """Maquina y opcionales de prueba, insertados una vez por modulo. Otros modulos
+    vacian las tablas: si sus tests se intercalan, el seed se vuelve a crear"""
+    db = session_factory()
+    clear_tables(db, "machines", "quotations", "options")
+    db.add_all([
+        Machine(
+            code="TEST001",
+            name="Test Machine",
+            price=15000.0,
+            category="Test Category",
+            description="Test machine description",
+            active=True
+        ),
+        Option(
+            name="Test Option 1",
+            price=1000.0,
+            description="Test option description 1",
+            active=True
+        ),
+        Option(
+            name="Test Option 2",
+            price=2000.0,
+            description="Test option description 2",
+            active=True
+        ),
+    ])
     db.commit()
     db.close()
 
+@pytest.fixture(autouse=True)
+def db_session(session_factory, engine, _seeded_db):
+    """Cada test corre dentro de una transaccion que se deshace al terminar: los commit
+    de la app y de los tests solo liberan SAVEPOINTs de esa transaccion"""
+    connection = engine.connect()
+    # pysqlite no emite BEGIN por su cuenta y maneja mal los SAVEPOINT: durante el test
+    # la transaccion se abre a mano (receta de SQLAlchemy para pysqlite)
+    dbapi_connection = connection.connection.dbapi_connection
+    dbapi_connection.isolation_level = None
+    event.listen(connection, "begin", lambda conn: conn.exec_driver_sql("BEGIN"))
+    transaction = connection.begin()
+    session_kw = dict(session_factory.kw)
+    session_factory.configure(bind=connection, join_transaction_mode="create_savepoint")
+    db = session_factory()
+    yield db
+    db.close()
+    session_factory.kw = session_kw
+    transaction.rollback()
+    dbapi_connection.isolation_level = ""
+    connection.close()
+    # Las respuestas cacheadas pueden incluir datos del test que ya no existen
+    for group in _response_caches:
+        _invalidate_cache(group)
+
 @pytest.fixture
-def admin_token():
-    """Obtener token de admin para tests"""
-    response = client.post("/admin/login", json=test_admin_credentials)
-    assert response.status_code == 200
-    return response.json()["access_token"]
+def setup_test_data(db_session):
+    options = db_session.query(Option).order_by(Option.name).all()
+    return {
+        "machine": db_session.query(Machine).filter(Machine.code == "TEST001").one(),
+        "option1": options[0],
+        "option2": options[1],
+    }
 
-def test_admin_login_success():
+def test_admin_login_success(client):
     """Test login exitoso de admin"""
     response = client.post("/admin/login", json=test_admin_credentials)
     assert response.status_code == 200
@@ -98,7 +96,7 @@ def test_admin_login_success():
     assert data["token_type"] == "bearer"
     assert data["expires_in"] == 900  # 15 minutos
 
-def test_admin_login_failure():
+def test_admin_login_failure(client):
     """Test login fallido de admin"""
     response = client.post("/admin/login", json={
         "username": "admin",
@@ -106,45 +104,50 @@ def test_admin_login_failure():
     })
     assert response.status_code == 401
 
-def test_admin_verify_token(admin_token):
+def test_admin_verify_token(client):
     """Test verificación de token de admin"""
-    headers = {"Authorization": f"Bearer {admin_token}"}
+    headers = ADMIN_HEADERS
     response = client.get("/admin/verify", headers=headers)
     assert response.status_code == 200
     data = response.json()
     assert data["valid"] == True
     assert data["user"] == "admin"
 
-def test_admin_verify_invalid_token():
+def test_admin_verify_invalid_token(client):
     """Test verificación de token inválido"""
     headers = {"Authorization": "Bearer invalid_token"}
     response = client.get("/admin/verify", headers=headers)
     assert response.status_code == 401
 
-def test_get_machines_admin(admin_token, setup_test_data):
-    """Test obtener máquinas con autenticación admin"""
-    headers = {"Authorization": f"Bearer {admin_token}"}
-    response = client.get("/admin/machines", headers=headers)
+@pytest.mark.parametrize(
+    "query_string,min_items,max_items",
+    [
+        ("", 1, None),
+        ("?active=true&category=Test Category", 1, None),
+        ("?skip=0&limit=5", 0, 5),
+    ],
+    ids=["sin-filtros", "con-filtros", "paginacion"],
+)
+def test_get_machines_admin(client, setup_test_data, query_string, min_items, max_items):
+    """Test listado de máquinas admin: sin filtros, con filtros y paginado"""
+    headers = ADMIN_HEADERS
+    response = client.get(f"/admin/machines{query_string}", headers=headers)
     assert response.status_code == 200
     data = response.json()
     assert "machines" in data
     assert "total" in data
-    assert len(data["machines"]) >= 1
-
-def test_get_machines_admin_with_filters(admin_token, setup_test_data):
-    """Test obtener máquinas con filtros"""
-    headers = {"Authorization": f"Bearer {admin_token}"}
-    response = client.get("/admin/machines?active=true&category=Test Category", headers=headers)
-    assert response.status_code == 200
-    data = response.json()
-    assert len(data["machines"]) >= 1
+    assert "skip" in data
+    assert "limit" in data
+    assert len(data["machines"]) >= min_items
+    if max_items is not None:
+        assert len(data["machines"]) <= max_items
 
-def test_get_machine_admin(admin_token, setup_test_data):
+def test_get_machine_admin(client, setup_test_data):
     """Test obtener una máquina específica"""
     test_data = setup_test_data
     machine = test_data["machine"]
     
-    headers = {"Authorization": f"Bearer {admin_token}"}
+    headers = ADMIN_HEADERS
     response = client.get(f"/admin/machines/{machine.id}", headers=headers)
     assert response.status_code == 200
     data = response.json()
@@ -152,9 +155,9 @@ def test_get_machine_admin(admin_token, setup_test_data):
     assert data["name"] == machine.name
     assert "options" in data
 
-def test_create_machine_admin(admin_token):
+def test_create_machine_admin(client):
     """Test crear una nueva máquina"""
-    headers = {"Authorization": f"Bearer {admin_token}"}
+    headers = ADMIN_HEADERS
     machine_data = {
         "code": "NEW001",
         "name": "New Test Machine",
@@ -170,12 +173,12 @@ def test_create_machine_admin(admin_token):
     assert data["code"] == "NEW001"
     assert data["name"] == "New Test Machine"
 
-def test_create_machine_duplicate_code(admin_token, setup_test_data):
+def test_create_machine_duplicate_code(client, setup_test_data):
     """Test crear máquina con código duplicado"""
     test_data = setup_test_data
     machine = test_data["machine"]
     
-    headers = {"Authorization": f"Bearer {admin_token}"}
+    headers = ADMIN_HEADERS
     machine_data = {
         "code": machine.code,  # Código duplicado
         "name": "Another Machine",
@@ -188,12 +191,12 @@ def test_create_machine_duplicate_code(admin_token, setup_test_data):
     response = client.post("/admin/machines", json=machine_data, headers=headers)
     assert response.status_code == 400
 
-def test_update_machine_admin(admin_token, setup_test_data):
+def test_update_machine_admin(client, setup_test_data):
     """Test actualizar una máquina"""
     test_data = setup_test_data
     machine = test_data["machine"]
     
-    headers = {"Authorization": f"Bearer {admin_token}"}
+    headers = ADMIN_HEADERS
     update_data = {
         "name": "Updated Machine Name",
         "price": 25000.0
@@ -205,13 +208,13 @@ def test_update_machine_admin(admin_token, setup_test_data):
     assert data["name"] == "Updated Machine Name"
     assert data["price"] == 25000.0
 
-def test_update_machine_with_options(admin_token, setup_test_data):
+def test_update_machine_with_options(client, setup_test_data):
     """Test actualizar máquina con opcionales"""
     test_data = setup_test_data
     machine = test_data["machine"]
     option1 = test_data["option1"]
     
-    headers = {"Authorization": f"Bearer {admin_token}"}
+    headers = ADMIN_HEADERS
     update_data = {
         "option_ids": [option1.id]
     }
@@ -219,18 +222,17 @@ def test_update_machine_with_options(admin_token, setup_test_data):
     response = client.put(f"/admin/machines/{machine.id}", json=update_data, headers=headers)
     assert response.status_code == 200
     
-    # Verificar que la máquina tiene el opcional asignado
-    response = client.get(f"/admin/machines/{machine.id}", headers=headers)
+    # La respuesta del PUT ya trae los opcionales asignados
     data = response.json()
     assert len(data["options"]) == 1
     assert data["options"][0]["id"] == option1.id
 
-def test_deactivate_machine_admin(admin_token, setup_test_data):
+def test_deactivate_machine_admin(client, setup_test_data):
     """Test desactivar una máquina"""
     test_data = setup_test_data
     machine = test_data["machine"]
     
-    headers = {"Authorization": f"Bearer {admin_token}"}
+    headers = ADMIN_HEADERS
     response = client.delete(f"/admin/machines/{machine.id}", headers=headers)
     assert response.status_code == 200
     
@@ -239,18 +241,18 @@ def test_deactivate_machine_admin(admin_token, setup_test_data):
     data = response.json()
     assert data["active"] == False
 
-def test_unauthorized_access():
+def test_unauthorized_access(client):
     """Test acceso no autorizado a endpoints admin"""
     response = client.get("/admin/machines")
     assert response.status_code == 401
 
-def test_create_machine_with_options(admin_token, setup_test_data):
+def test_create_machine_with_options(client, setup_test_data):
     """Test crear máquina con opcionales"""
     test_data = setup_test_data
     option1 = test_data["option1"]
     option2 = test_data["option2"]
     
-    headers = {"Authorization": f"Bearer {admin_token}"}
+    headers = ADMIN_HEADERS
     machine_data = {
         "code": "OPT001",
         "name": "Machine with Options",
@@ -265,25 +267,12 @@ def test_create_machine_with_options(admin_token, setup_test_data):
     data = response.json()
     assert data["code"] == "OPT001"
     
-    # Verificar que tiene los opcionales asignados
-    response = client.get(f"/admin/machines/{data['id']}", headers=headers)
-    machine_data = response.json()
-    assert len(machine_data["options"]) == 2
-
-def test_pagination(admin_token, setup_test_data):
-    """Test paginación en listado de máquinas"""
-    headers = {"Authorization": f"Bearer {admin_token}"}
-    response = client.get("/admin/machines?skip=0&limit=5", headers=headers)
-    assert response.status_code == 200
-    data = response.json()
-    assert "total" in data
-    assert "skip" in data
-    assert "limit" in data
-    assert len(data["machines"]) <= 5
+    # La respuesta del POST ya trae los opcionales asignados
+    assert len(data["options"]) == 2
 
 
-def test_get_quotations_default_excludes_deleted(admin_token, setup_test_data):
-    db = TestingSessionLocal()
+def test_get_quotations_default_excludes_deleted(client, session_factory, setup_test_data):
+    db = session_factory()
     machine = setup_test_data["machine"]
 
     old_q = Quotation(
@@ -317,7 +306,7 @@ def test_get_quotations_default_excludes_deleted(admin_token, setup_test_data):
     db.commit()
     db.close()
 
-    headers = {"Authorization": f"Bearer {admin_token}"}
+    headers = ADMIN_HEADERS
     response = client.get("/quotations", headers=headers)
     assert response.status_code == 200
     data = response.json()
@@ -327,11 +316,15 @@ def test_get_quotations_default_excludes_deleted(admin_token, setup_test_data):
     assert data["total"] == 2
     assert len(data["items"]) == 2
     assert data["items"][0]["created_at"] >= data["items"][1]["created_at"]
+    # Con offset explicito: sin el, el frontend lo toma como hora local
+    assert all(datetime.fromisoformat(item["created_at"]).tzinfo is not None for item in data["items"])
     assert all(item["is_deleted"] is False for item in data["items"])
+    # Columna interna de busqueda, no forma parte de la respuesta
+    assert all("client_cuit_digits" not in item for item in data["items"])
 
 
-def test_get_quotations_include_deleted_and_search(admin_token, setup_test_data):
-    db = TestingSessionLocal()
+def test_get_quotations_include_deleted_and_search(client, session_factory, setup_test_data):
+    db = session_factory()
     machine = setup_test_data["machine"]
 
     active_q = Quotation(
@@ -357,7 +350,7 @@ def test_get_quotations_include_deleted_and_search(admin_token, setup_test_data)
     db.commit()
     db.close()
 
-    headers = {"Authorization": f"Bearer {admin_token}"}
+    headers = ADMIN_HEADERS
     response = client.get("/quotations?include_deleted=true&q=Buscar", headers=headers)
     assert response.status_code == 200
     data = response.json()
@@ -367,8 +360,8 @@ def test_get_quotations_include_deleted_and_search(admin_token, setup_test_data)
     assert "Cliente Buscar" in names or any("Buscar" in (item.get("client_company") or "") for item in data["items"])
 
 
-def test_soft_delete_and_restore_quotation(admin_token, setup_test_data):
-    db = TestingSessionLocal()
+def test_soft_delete_and_restore_quotation(client, session_factory, setup_test_data):
+    db = session_factory()
     machine = setup_test_data["machine"]
     quotation = Quotation(
         machine_code=machine.code,
@@ -385,13 +378,13 @@ def test_soft_delete_and_restore_quotation(admin_token, setup_test_data):
     quotation_id = quotation.id
     db.close()
 
-    headers = {"Authorization": f"Bearer {admin_token}"}
+    headers = ADMIN_HEADERS
 
     delete_response = client.delete(f"/quotations/{quotation_id}", headers=headers)
     assert delete_response.status_code == 200
 
-    db = TestingSessionLocal()
-    stored = db.query(Quotation).filter(Quotation.id == quotation_id).first()
+    db = session_factory()
+    stored = db.get(Quotation, quotation_id)
     assert stored is not None
     assert stored.is_deleted is True
     assert stored.deleted_at is not None
@@ -401,8 +394,8 @@ def test_soft_delete_and_restore_quotation(admin_token, setup_test_data):
     restore_response = client.post(f"/quotations/{quotation_id}/restore", headers=headers)
     assert restore_response.status_code == 200
 
-    db = TestingSessionLocal()
-    restored = db.query(Quotation).filter(Quotation.id == quotation_id).first()
+    db = session_factory()
+    restored = db.get(Quotation, quotation_id)
     assert restored is not None
     assert restored.is_deleted is False
     assert restored.deleted_at is None
@@ -410,8 +403,8 @@ def test_soft_delete_and_restore_quotation(admin_token, setup_test_data):
     db.close()
 
 
-def test_get_quotations_search_cuit_with_or_without_hyphen(admin_token, setup_test_data):
-    db = TestingSessionLocal()
+def test_get_quotations_search_cuit_with_or_without_hyphen(client, session_factory, setup_test_data):
+    db = session_factory()
     machine = setup_test_data["machine"]
     quotation = Quotation(
         machine_code=machine.code,
@@ -426,7 +419,7 @@ def test_get_quotations_search_cuit_with_or_without_hyphen(admin_token, setup_te
     db.commit()
     db.close()
 
-    headers = {"Authorization": f"Bearer {admin_token}"}
+    headers = ADMIN_HEADERS
 
     res_hyphen = client.get("/quotations?q=20-17855887-1", headers=headers)
     assert res_hyphen.status_code == 200
@@ -438,10 +431,142 @@ def test_get_quotations_search_cuit_with_or_without_hyphen(admin_token, setup_te
     data_plain = res_plain.json()
     assert any(item["client_cuit"] == "20-17855887-1" for item in data_plain["items"])
 
-# Cleanup test database after all tests
-def teardown_module():
-    if os.path.exists("test_admin.db"):
-        try:
-            os.unlink("test_admin.db")
-        except:
-            pass  # File might be in use 
+    # Otros separadores y busqueda parcial por DNI
+    for q in ("20.17855887.1", "17855887"):
+        res = client.get("/quotations", params={"q": q}, headers=headers)
+        assert res.status_code == 200
+        assert any(item["client_cuit"] == "20-17855887-1" for item in res.json()["items"])
+
+@pytest.fixture
+def raiseload_session(session_factory):
+    """Toda consulta de las sesiones de test lleva raiseload("*"): un lazy load no
+    declarado con selectinload/joinedload falla en vez de ser un N+1 silencioso"""
+    def add_raiseload(state):
+        if state.is_select and not (state.is_relationship_load or state.is_column_load):
+            state.statement = state.statement.options(raiseload("*"))
+
+    event.listen(session_factory, "do_orm_execute", add_raiseload)
+    yield
+    event.remove(session_factory, "do_orm_execute", add_raiseload)
+
+@pytest.fixture
+def count_selects(engine):
+    """Cuenta los SELECT que llegan a la base durante el test (al estilo assertNumQueries)"""
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def test_admin_machines_queries_do_not_grow_with_rows(client, setup_test_data, db_session, count_selects):
+    """Listado y detalle de maquinas: cantidad fija de consultas, sin N+1 por opcionales"""
+    options = [setup_test_data["option1"], setup_test_data["option2"]]
+    for i in range(5):
+        db_session.add(Machine(code=f"NPLUS{i}", name=f"Machine {i}", price=1000.0 + i,
+                               category="Test Category", active=True, options=options))
+    db_session.commit()
+    headers = ADMIN_HEADERS
+
+    count_selects.clear()
+    response = client.get("/admin/machines", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["machines"]) >= 6
+    assert len(count_selects) <= 2  # total + maquinas con opcionales
+
+    machine_id = response.json()["machines"][-1]["id"]
+    count_selects.clear()
+    response = client.get(f"/admin/machines/{machine_id}", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["options"]) == 2
+    assert len(count_selects) <= 2
+
+def test_savepoint_rollback_keeps_catalog_invalidation(client, setup_test_data, db_session):
+    """Un begin_nested deshecho no descarta las marcas de cache de flushes anteriores"""
+    assert all(m["code"] != "SAVEPT1" for m in client.get("/machines").json())
+
+    db_session.add(Machine(code="SAVEPT1", name="Savepoint", price=1.0, active=True))
+    db_session.flush()
+    savepoint = db_session.begin_nested()
+    db_session.add(Option(name="Opcional descartado", price=1.0, active=True))
+    db_session.flush()
+    savepoint.rollback()
+    db_session.commit()
+
+    assert any(m["code"] == "SAVEPT1" for m in client.get("/machines").json())
+
+def test_multiple_quotation_queries_do_not_grow_with_items(client, setup_test_data, db_session, count_selects):
+    """Cotizacion multiple: maquinas, specs y opcionales se cargan una vez, sin
+    volver a consultarlos por item despues del commit"""
+    option = setup_test_data["option1"]
+    for i in range(10):
+        db_session.add(Machine(code=f"QMULTI{i}", name=f"Machine {i}", price=1000.0,
+                               category="Test Category", active=True, options=[option],
+                               specs=[MachineSpec(spec_text=f"Spec {i}")]))
+    db_session.commit()
+
+    def quote(n_items):
+        items = [{"machine_code": f"QMULTI{i}", "quantity": 1, "unit_price": 1000.0,
+                  "discount_percent": 0,
+                  "options": [{"id": option.id, "quantity": 1, "unit_price": option.price}]}
+                 for i in range(n_items)]
+        count_selects.clear()
+        response = client.post("/quotations", json={
+            "items": items, "client_cuit": "20-12345678-9", "client_name": "Cliente Multiple",
+        })
+        assert response.status_code == 200
+        return len(count_selects)
+
+    quote(1)  # calienta el cache de condiciones de pago
+    assert quote(1) == quote(10)
+
+def test_list_machines_admin_queries_do_not_grow_with_rows(client, setup_test_data, db_session, count_selects):
+    """El listado de la lista de precios lee solo columnas: maquinas, specs y opcionales
+    en tres consultas, sin importar cuantas maquinas haya"""
+    options = [setup_test_data["option1"], setup_test_data["option2"]]
+    for i in range(5):
+        db_session.add(Machine(code=f"PLIST{i}", name=f"Machine {i}", price=1000.0,
+                               category="Test Category", active=True, options=options,
+                               specs=[MachineSpec(spec_text=f"Spec {i}")]))
+    db_session.commit()
+
+    count_selects.clear()
+    response = client.get("/admin/price-list/machines", headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    machine = next(m for m in response.json() if m["code"] == "PLIST0")
+    assert [spec["text"] for spec in machine["specs"]] == ["Spec 0"]
+    assert len(machine["options"]) == 2
+    assert len(count_selects) == 3
+
+def test_confirm_price_list_no_lazy_loads(client, setup_test_data, raiseload_session):
+    """Importar la lista de precios no dispara lazy loads"""
+    headers = ADMIN_HEADERS
+    products = [
+        {"code": "TEST001", "name": "Test Machine", "price": 16000.0,
+         "specs": ["Spec A"], "optionals": [{"name": "Test Option 1", "price": 1000.0}]},
+        {"code": "RAISE001", "name": "Nueva", "price": 5000.0,
+         "specs": ["Spec B"], "optionals": [{"name": "Opcional nuevo", "price": 300.0}]},
+    ]
+    response = client.post("/admin/price-list/confirm", json={"products": products}, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["errors"] == []
+    assert data["imported"] == 1
+    assert data["updated"] == 1
+
+def test_confirm_price_list_reports_malformed_entries(client, setup_test_data, db_session):
+    """Specs u opcionales mal formados quedan en errors sin cortar la importacion"""
+    products = [
+        {"code": "OKPROD", "name": "Valida", "price": 100.0, "specs": ["Spec"],
+         "optionals": [{"name": "Opcional OK", "price": 10.0}]},
+        {"code": "BADSPEC", "name": "Spec nula", "price": 100.0, "specs": [None]},
+        {"code": "BADOPT", "name": "Opcional invalido", "price": 100.0, "optionals": ["x"]},
+    ]
+    response = client.post("/admin/price-list/confirm", json={"products": products}, headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["imported"] == 1
+    assert len(data["errors"]) == 2
+    codes = {code for (code,) in db_session.query(Machine.code).filter(Machine.code.in_(["OKPROD", "BADSPEC", "BADOPT"]))}
+    assert codes == {"OKPROD"}
@@ -1,35 +1,14 @@
 import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from main import app, get_db, Base, Machine, Quotation
+from main import Machine
 import tempfile
 import os
 
-# Create test database
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test_enhanced.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-Base.metadata.create_all(bind=engine)
-
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
-
-app.dependency_overrides[get_db] = override_get_db
-
-client = TestClient(app)
 
 @pytest.fixture
-def setup_test_data():
-    db = TestingSessionLocal()
+def setup_test_data(session_factory, clear_tables):
+    db = session_factory()
     # Clear existing data
-    db.query(Machine).delete()
-    db.query(Quotation).delete()
+    clear_tables(db, "machines", "quotations")
     
     # Add test machine
     test_machine = Machine(
@@ -46,25 +25,24 @@ def setup_test_data():
     yield test_machine
     
     # Cleanup
-    db.query(Machine).delete()
-    db.query(Quotation).delete()
+    clear_tables(db, "machines", "quotations")
     db.commit()
     db.close()
 
-def test_health_check():
+def test_health_check(client):
     response = client.get("/health")
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "healthy"
 
-def test_get_machines(setup_test_data):
+def test_get_machines(client, setup_test_data):
     response = client.get("/machines")
     assert response.status_code == 200
     data = response.json()
     assert len(data) >= 1
     assert any(machine["code"] == "TEST001" for machine in data)
 
-def test_get_machinery_catalog():
+def test_get_machinery_catalog(client):
     response = client.get("/machines/catalog")
     assert response.status_code == 200
     data = response.json()
@@ -73,7 +51,7 @@ def test_get_machinery_catalog():
     assert "categoria" in data[0]
     assert "productos" in data[0]
 
-def test_get_machine_by_code(setup_test_data):
+def test_get_machine_by_code(client, setup_test_data):
     machine = setup_test_data
     response = client.get(f"/machines/{machine.code}")
     assert response.status_code == 200
@@ -81,14 +59,14 @@ def test_get_machine_by_code(setup_test_data):
     assert data["code"] == "TEST001"
     assert data["name"] == "Test Machine Enhanced"
 
-def test_update_machine_price(setup_test_data):
+def test_update_machine_price(client, setup_test_data):
     machine = setup_test_data
     response = client.put(f"/machines/{machine.code}", json={"price": 18000.0})
     assert response.status_code == 200
     data = response.json()
     assert data["price"] == 18000.0
 
-def test_generate_quote_with_discount(setup_test_data):
+def test_generate_quote_with_discount(client, setup_test_data):
     machine = setup_test_data
     quote_data = {
         "machineCode": machine.code,
@@ -105,7 +83,7 @@ def test_generate_quote_with_discount(setup_test_data):
     assert response.status_code == 200
     assert response.headers["content-type"] == "application/pdf"
 
-def test_generate_quote_without_discount(setup_test_data):
+def test_generate_quote_without_discount(client, setup_test_data):
     machine = setup_test_data
     quote_data = {
         "machineCode": machine.code,
@@ -119,11 +97,11 @@ def test_generate_quote_without_discount(setup_test_data):
     assert response.status_code == 200
     assert response.headers["content-type"] == "application/pdf"
 
-def test_machine_not_found():
+def test_machine_not_found(client):
     response = client.get("/machines/NONEXISTENT")
     assert response.status_code == 404
 
-def test_quote_machine_not_found():
+def test_quote_machine_not_found(client):
     quote_data = {
         "machineCode": "NONEXISTENT",
         "clientCuit": "20-12345678-9",
@@ -134,8 +112,3 @@ def test_quote_machine_not_found():
     
     response = client.post("/generate-quote", json=quote_data)
     assert response.status_code == 404
-
-# Cleanup test database after all tests
-def teardown_module():
-    if os.path.exists("test_enhanced.db"):
-        os.unlink("test_enhanced.db")
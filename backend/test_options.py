@@ -1,37 +1,17 @@
 import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from main import app, get_db, Base, Machine, Quotation, Option
+from main import Machine, Option
 import tempfile
 import os
 import json
 
-# Create test database
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test_options.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base.metadata.create_all(bind=engine)
-
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
-
-app.dependency_overrides[get_db] = override_get_db
-
-client = TestClient(app)
+_TABLES = ("machine_option", "machines", "quotations", "options")
 
 @pytest.fixture
-def setup_test_data():
-    db = TestingSessionLocal()
+def setup_test_data(session_factory, clear_tables):
+    db = session_factory()
     # Clear existing data
-    db.query(Machine).delete()
-    db.query(Quotation).delete()
-    db.query(Option).delete()
+    clear_tables(db, *_TABLES)
     
     # Add test machine
     test_machine = Machine(
@@ -42,7 +22,6 @@ def setup_test_data():
         description="Test machine description",
         active=True
     )
-    db.add(test_machine)
     
     # Add test options
     test_option1 = Option(
@@ -57,8 +36,7 @@ def setup_test_data():
         description="Test option description 2",
         active=True
     )
-    db.add(test_option1)
-    db.add(test_option2)
+    db.add_all([test_machine, test_option1, test_option2])
     db.commit()
     
     yield {
@@ -68,13 +46,11 @@ def setup_test_data():
     }
     
     # Cleanup
-    db.query(Machine).delete()
-    db.query(Quotation).delete()
-    db.query(Option).delete()
+    clear_tables(db, *_TABLES)
     db.commit()
     db.close()
 
-def test_get_options(setup_test_data):
+def test_get_options(client, setup_test_data):
     response = client.get("/options")
     assert response.status_code == 200
     data = response.json()
@@ -82,7 +58,7 @@ def test_get_options(setup_test_data):
     assert any(option["name"] == "Test Option 1" for option in data)
     assert any(option["name"] == "Test Option 2" for option in data)
 
-def test_create_option():
+def test_create_option(client):
     option_data = {
         "name": "New Test Option",
         "price": 1500.0,
@@ -93,7 +69,7 @@ def test_create_option():
     response = client.post("/admin/options", json=option_data)
     assert response.status_code == 401
 
-def test_update_machine_options(setup_test_data):
+def test_update_machine_options(client, setup_test_data):
     test_data = setup_test_data
     machine = test_data["machine"]
     option1 = test_data["option1"]
@@ -102,7 +78,7 @@ def test_update_machine_options(setup_test_data):
     response = client.put(f"/admin/machines/{machine.code}/options", json=[option1.id])
     assert response.status_code == 401
 
-def test_get_machine_options(setup_test_data):
+def test_get_machine_options(client, setup_test_data):
     test_data = setup_test_data
     machine = test_data["machine"]
     
@@ -111,7 +87,7 @@ def test_get_machine_options(setup_test_data):
     data = response.json()
     assert isinstance(data, list)
 
-def test_generate_quote_with_options(setup_test_data):
+def test_generate_quote_with_options(client, setup_test_data):
     test_data = setup_test_data
     machine = test_data["machine"]
     option1 = test_data["option1"]
@@ -131,7 +107,7 @@ def test_generate_quote_with_options(setup_test_data):
     assert response.status_code == 200
     assert response.headers["content-type"] == "application/pdf"
 
-def test_generate_quote_without_options(setup_test_data):
+def test_generate_quote_without_options(client, setup_test_data):
     test_data = setup_test_data
     machine = test_data["machine"]
     
@@ -146,11 +122,6 @@ def test_generate_quote_without_options(setup_test_data):
     assert response.status_code == 200
     assert response.headers["content-type"] == "application/pdf"
 
-def test_option_not_found():
+def test_option_not_found(client):
     response = client.get("/machines/TEST001/options")
     assert response.status_code == 404
-
-# Cleanup test database after all tests
-def teardown_module():
-    if os.path.exists("test_options.db"):
-        os.unlink("test_options.db") 
\ No newline at end of file
@@ -1,6 +1,14 @@
 from datetime import timezone, timedelta
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
+_UTC_MINUS_3 = timezone(timedelta(hours=-3))
+
+# Resuelta una sola vez al importar
+try:
+    ARG_TZ = ZoneInfo("America/Argentina/Buenos_Aires")
+except ZoneInfoNotFoundError:
+    ARG_TZ = _UTC_MINUS_3
+
 
 def get_arg_tz():
     """
@@ -8,7 +16,4 @@ def get_arg_tz():
     Fallback to fixed UTC-3 so the app keeps working on Windows environments
     where tzdata is not installed.
     """
-    try:
-        return ZoneInfo("America/Argentina/Buenos_Aires")
-    except ZoneInfoNotFoundError:
-        return timezone(timedelta(hours=-3))
+    return ARG_TZ